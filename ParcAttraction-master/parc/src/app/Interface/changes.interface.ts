@@ -0,0 +1,9 @@
+import { AttractionInterface, CritiqueInterface } from './attraction.interface';
+
+export interface ChangesInterface {
+    version: string;
+    full: boolean;
+    attractions?: AttractionInterface[];
+    removed_attractions?: number[];
+    critiques?: CritiqueInterface[];
+}
@@ -3,6 +3,7 @@ import { Observable, map } from 'rxjs';
 import { DataService } from './data.service';
 import { AttractionInterface } from '../Interface/attraction.interface';
 import { MessageInterface } from '../Interface/message.interface';
+import { ChangesInterface } from '../Interface/changes.interface';
 
 @Injectable({
   providedIn: 'root',
@@ -31,6 +32,12 @@ export class AttractionService {
     return this.dataService.getData("https://api/attraction/visible/critiques") as Observable<AttractionInterface[]>;
   }
 
+  // Changements depuis `version` ; sans version, renvoie seulement la version courante (full = true)
+  public getChanges(version: string | null): Observable<ChangesInterface> {
+    const url = version ? `https://api/changes?since=${encodeURIComponent(version)}` : "https://api/changes";
+    return this.dataService.getData(url) as Observable<ChangesInterface>;
+  }
+
   public postCritique(critique: any): Observable<any> {
     return this.dataService.postData("https://api/critique", critique);
   }
@@ -31,6 +31,10 @@ export class AuthService {
   }
 
   logout(): void {
+    // Révoque le token côté API (l'intercepteur ajoute encore l'en-tête Authorization)
+    if (this.user) {
+      this.http.post('https://api/logout', {}).subscribe({ error: () => {} });
+    }
     this.isLoggedIn = false;
     this.user = null;
     localStorage.setItem("user", "");
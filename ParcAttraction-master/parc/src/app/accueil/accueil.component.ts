@@ -1,8 +1,9 @@
 import { Component, OnInit } from '@angular/core';
 import { AttractionService } from '../Service/attraction.service';
 import { CommonModule } from '@angular/common';
-import { Observable } from 'rxjs';
+import { BehaviorSubject } from 'rxjs';
 import { AttractionInterface } from '../Interface/attraction.interface';
+import { ChangesInterface } from '../Interface/changes.interface';
 import { MatCardModule } from '@angular/material/card';
 import { MatButtonModule } from '@angular/material/button';
 import { MatIconModule } from '@angular/material/icon';
@@ -26,14 +27,67 @@ import { CritiqueDialogComponent } from '../critique-dialog/critique-dialog.comp
 })
 export class AccueilComponent implements OnInit {
 
-  public attractions: Observable<AttractionInterface[]>;
+  // null tant que la liste n'est pas chargée
+  public attractions = new BehaviorSubject<AttractionInterface[] | null>(null);
   public currentLang: string = 'fr';
+  // Version de la liste affichée, pour ne demander ensuite que les changements
+  private version: string | null = null;
 
   constructor(
     public attractionService: AttractionService,
     private dialog: MatDialog
   ) {
-    this.attractions = this.attractionService.getAllVisibleAttractionWithCritiques();
+    this.chargerTout();
+  }
+
+  // La version est lue avant la liste : un changement fait entre les deux sera renvoyé à la synchronisation suivante
+  chargerTout() {
+    this.attractionService.getChanges(null).subscribe(changes => {
+      this.version = changes.version;
+      this.attractionService.getAllVisibleAttractionWithCritiques().subscribe(liste => this.attractions.next(liste));
+    });
+  }
+
+  synchroniser() {
+    if (!this.version) {
+      this.chargerTout();
+      return;
+    }
+    this.attractionService.getChanges(this.version).subscribe(changes => {
+      if (changes.full) {
+        this.chargerTout();
+        return;
+      }
+      this.version = changes.version;
+      this.attractions.next(this.appliquerChangements(this.attractions.value ?? [], changes));
+    });
+  }
+
+  // Les éléments sont appliqués par identifiant : en recevoir un deux fois est sans effet
+  appliquerChangements(liste: AttractionInterface[], changes: ChangesInterface): AttractionInterface[] {
+    const attractionsSupprimees = new Set(changes.removed_attractions ?? []);
+    const parId = new Map<number, AttractionInterface>();
+    for (const attraction of liste) {
+      if (!attractionsSupprimees.has(attraction.attraction_id)) {
+        parId.set(attraction.attraction_id, attraction);
+      }
+    }
+
+    for (const attraction of changes.attractions ?? []) {
+      const existante = parId.get(attraction.attraction_id);
+      parId.set(attraction.attraction_id, { ...existante, ...attraction, critiques: existante?.critiques ?? [] });
+    }
+
+    for (const critique of changes.critiques ?? []) {
+      const attraction = parId.get(critique.attraction_id);
+      if (attraction) {
+        const critiques = (attraction.critiques ?? []).filter(c => c.critique_id !== critique.critique_id);
+        parId.set(attraction.attraction_id, { ...attraction, critiques: [...critiques, critique] });
+      }
+    }
+
+    // Les critiques d'une attraction supprimée disparaissent avec elle
+    return Array.from(parId.values());
   }
 
   ngOnInit() {
@@ -61,8 +115,8 @@ export class AccueilComponent implements OnInit {
         this.attractionService.postCritique(result).subscribe({
           next: () => {
             alert($localize`:@@avisMerci:Merci pour votre avis !`);
-            // Recharger les attractions pour afficher la nouvelle critique
-            this.attractions = this.attractionService.getAllVisibleAttractionWithCritiques();
+            // Ne recharger que ce qui a changé pour afficher la nouvelle critique
+            this.synchroniser();
           },
           error: (err) => {
             console.error('Erreur lors de l\'envoi de la critique:', err);
@@ -1,18 +1,180 @@
-from flask import Flask, jsonify, request
+import time
+
+from flask import Flask, Response, jsonify, request, stream_with_context
 
 import request.request as req
+import request.pool as pool
+import request.slow_query as slow_query
 import controller.auth.auth as user
+import controller.compression as compression
 import controller.attraction as attraction
+import controller.export as export
+import controller.pagination as pagination
+import controller.search as search
+import controller.write_behind as write_behind
+from controller.json_provider import FastJSONProvider
+import metrics.metrics as metrics
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # ⚠️ PAS DE Flask-CORS du tout !
 # Nginx gère TOUT le CORS
 
+# Mesure de chaque requête : latence par route et code HTTP, coût en base
+@app.before_request
+def startTimer():
+    request.environ['parc.start'] = time.perf_counter()
+    metrics.start_request()
+
+@app.after_request
+def recordMetrics(response):
+    start = request.environ.get('parc.start')
+    if (start is not None):
+        route = request.url_rule.rule if request.url_rule else '<inconnue>'
+        metrics.end_request(route, request.method, response.status_code, time.perf_counter() - start)
+    return response
+
+# Enregistré après recordMetrics : exécuté avant lui, la latence mesurée inclut la compression
+@app.after_request
+def compressResponse(response):
+    return compression.compress_response(request, response)
+
+def conditional_json(entry):
+    """Réponse JSON d'une entrée du cache, avec ETag et Last-Modified
+
+    Renvoie 304 sans sérialiser si le client possède déjà cette version.
+    If-None-Match est prioritaire sur If-Modified-Since.
+    """
+    if request.if_none_match:
+        # Comparaison faible : l'ETag d'une réponse compressée est faible
+        not_modified = request.if_none_match.contains_weak(entry.etag)
+    else:
+        not_modified = (entry.last_modified is not None
+                        and request.if_modified_since is not None
+                        and entry.last_modified <= request.if_modified_since)
+
+    encoding = compression.negotiate(request)
+    if (len(entry.body) < compression.MIN_SIZE):
+        encoding = None
+
+    if not_modified:
+        response = Response(status=304)
+        # Même validateur que la réponse 200 équivalente : faible si elle est compressée
+        response.set_etag(entry.etag, weak=encoding is not None)
+        response.vary.add('Accept-Encoding')
+    else:
+        response = Response(entry.body, mimetype='application/json')
+        response.set_etag(entry.etag)
+        # Le corps compressé est gardé avec l'entrée : compressé une fois, pas à chaque envoi
+        if (encoding):
+            compression.set_encoded(response, attraction.cache.encode(entry, encoding, compression.compress), encoding)
+    if entry.last_modified is not None:
+        response.last_modified = entry.last_modified
+    # Le navigateur revalide à chaque fois au lieu de réutiliser une copie périmée
+    response.cache_control.no_cache = True
+    return response
+
+def is_paginated():
+    return 'limit' in request.args or 'after' in request.args
+
+def pagination_args():
+    """Lit ?limit= et ?after= ; renvoie (limit, after, message d'erreur ou None)"""
+    limit = request.args.get('limit', pagination.DEFAULT_LIMIT, type=int)
+    if (limit < 1 or limit > pagination.MAX_LIMIT):
+        return None, None, f"limit doit être compris entre 1 et {pagination.MAX_LIMIT}"
+
+    after = None
+    if ('after' in request.args):
+        after = pagination.decode_cursor(request.args['after'])
+        if (after is None):
+            return None, None, "Curseur invalide"
+    return limit, after, None
+
+@app.errorhandler(pool.PoolTimeout)
+def poolTimeout(e):
+    print(e, flush=True)
+    return jsonify({"message": "Serveur surchargé, veuillez réessayer."}), 503
+
+@app.errorhandler(write_behind.BufferFull)
+def bufferFull(e):
+    response = jsonify({"message": "Trop de critiques en attente, veuillez réessayer."})
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
 @app.route('/')
 def hello_world():
     return 'Hello, Docker!'
 
+def metricGauges():
+    """Jauges de ce worker exposées par /metrics, avec leurs clés cumulatives (compteurs)"""
+    gauges = [
+        ("parc_db_pool", req.get_pool().stats(),
+         ("borrows", "waits", "timeouts", "wait_time_total_ms", "opened", "closed")),
+        ("parc_attraction_cache", attraction.cache.stats(),
+         ("hits", "misses", "evictions", "expirations", "invalidations")),
+        ("parc_cache_invalidation", attraction.invalidations.stats(),
+         ("published", "applied", "failures")),
+        ("parc_db", slow_query.stats(), ("slow_queries",)),
+        ("parc_auth_token_cache", user.token_cache_stats(),
+         ("hits", "misses", "expired", "evictions", "revoked", "invalid")),
+    ]
+    if (attraction.critique_buffer is not None):
+        gauges.append(("parc_critique_buffer", attraction.critique_buffer.stats(),
+                       ("accepted", "rejected", "flushed", "batches", "dropped")))
+    if (attraction.snapshots is not None):
+        gauges.append(("parc_snapshot", attraction.snapshots.stats(),
+                       ("scheduled", "published", "failures")))
+    return gauges
+
+metrics.register_gauges(metricGauges)
+
+@app.get('/metrics')
+def getMetrics():
+    """Métriques au format texte Prometheus (tous les workers si METRICS_MULTIPROC_DIR est défini)
+
+    Non exposée par nginx : à collecter directement sur api:5000, depuis le réseau Docker.
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.get('/stats/pool')
+def getPoolStats():
+    """Statistiques du pool de connexions (taille, emprunts, attentes)"""
+    checkToken = user.check_token(request)
+    if (checkToken != True):
+        return checkToken
+
+    return jsonify(req.get_pool().stats()), 200
+
+@app.get('/stats/cache')
+def getCacheStats():
+    """Statistiques du cache des attractions (succès, échecs, évictions)"""
+    checkToken = user.check_token(request)
+    if (checkToken != True):
+        return checkToken
+
+    return jsonify(attraction.cache.stats()), 200
+
+@app.get('/stats/slow-queries')
+def getSlowQueries():
+    """Requêtes les plus lentes par forme normalisée, avec leur plan d'exécution"""
+    checkToken = user.check_token(request)
+    if (checkToken != True):
+        return checkToken
+
+    return jsonify(slow_query.top()), 200
+
+@app.get('/stats/write-behind')
+def getWriteBehindStats():
+    """État du tampon d'écriture différée des critiques (désactivé si null)"""
+    checkToken = user.check_token(request)
+    if (checkToken != True):
+        return checkToken
+
+    if (attraction.critique_buffer is None):
+        return jsonify(None), 200
+    return jsonify(attraction.critique_buffer.stats()), 200
+
 # Attraction Routes
 @app.post('/attraction')
 def addAttraction():
@@ -30,25 +192,76 @@ def addAttraction():
 
 @app.get('/attraction')
 def getAllAttraction():
-    result = attraction.get_all_attraction()
-    return result, 200
+    """Liste des attractions, paginée si ?limit= ou ?after= est fourni
+
+    ?ids=1,5,9 renvoie seulement ces attractions, dans cet ordre.
+    """
+    if ('ids' in request.args):
+        return attractionsByIds(request.args['ids'])
+    if (is_paginated()):
+        limit, after, erreur = pagination_args()
+        if (erreur):
+            return jsonify({"message": erreur}), 400
+        return jsonify(attraction.get_attractions_page(limit, after)), 200
+    return conditional_json(attraction.get_all_attraction_entry())
+
+@app.post('/attraction/lookup')
+def lookupAttractions():
+    """Variante de GET /attraction?ids= avec les identifiants dans le corps : {"ids": [1, 5, 9]}"""
+    json = request.get_json(silent=True)
+    if (not isinstance(json, dict)):
+        return jsonify({"message": "Corps JSON attendu : {\"ids\": [...]}"}), 400
+    return attractionsByIds(json.get('ids'))
+
+def attractionsByIds(ids):
+    ids, erreur = attraction.parse_attraction_ids(ids)
+    if (erreur):
+        return jsonify({"message": erreur}), 400
+    return jsonify(attraction.get_attractions_by_ids(ids)), 200
 
 @app.get('/attraction/<int:index>')
 def getAttraction(index):
-    result = attraction.get_attraction(index)
-    return result, 200
+    return conditional_json(attraction.get_attraction_entry(index))
+
+@app.get('/attraction/<int:index>/stats')
+def getAttractionStats(index):
+    """Nombre de critiques, moyenne et répartition des notes d'une attraction"""
+    entry = attraction.get_attraction_stats_entry(index)
+    if (entry.value is None):
+        return jsonify({"message": "Attraction introuvable"}), 404
+    return conditional_json(entry)
+
+@app.post('/attraction/stats/rebuild')
+def rebuildAttractionStats():
+    """Recalcule les statistiques de notes depuis la table critique"""
+    checkToken = user.check_token(request)
+    if (checkToken != True):
+        return checkToken
+
+    nb_attractions = attraction.rebuild_attraction_stats()
+    return jsonify({"message": "Statistiques recalculées.", "result": nb_attractions}), 200
 
 @app.get('/attraction/visible')
 def getVisibleAttractions():
-    """Récupère uniquement les attractions visibles (sans critiques)"""
-    result = attraction.get_visible_attractions()
-    return jsonify(result), 200
+    """Récupère uniquement les attractions visibles (sans critiques), avec leurs statistiques de notes"""
+    return conditional_json(attraction.get_visible_attractions_entry())
 
 @app.get('/attraction/visible/critiques')
 def getVisibleAttractionsWithCritiques():
-    """Récupère les attractions visibles avec leurs critiques"""
-    result = attraction.get_visible_attractions_with_critiques()
-    return jsonify(result), 200
+    """Récupère les attractions visibles avec leurs critiques
+
+    ?critiques_limit=N limite le nombre de critiques renvoyées par attraction
+    """
+    critiques_limit = request.args.get('critiques_limit', type=int)
+    if (critiques_limit is not None and critiques_limit < 0):
+        return jsonify({"message": "critiques_limit doit être positif"}), 400
+    return conditional_json(attraction.get_visible_attractions_with_critiques_entry(critiques_limit))
+
+@app.get('/changes')
+def getChanges():
+    """Changements des listes publiques depuis ?since=<version> (synchronisation différentielle)"""
+    since = request.args.get('since')
+    return jsonify(attraction.get_changes(since)), 200
 
 @app.delete('/attraction/<int:index>')
 def deleteAttraction(index):
@@ -66,17 +279,81 @@ def deleteAttraction(index):
 def addCritique():
     """Ajoute une critique pour une attraction"""
     json = request.get_json()
+    if (attraction.critique_buffer is not None):
+        if (attraction.enqueue_critique(json)):
+            return jsonify({"message": "Critique acceptée", "critique_id": None}), 202
+        return jsonify({"message": "Erreur lors de l'ajout de la critique"}), 400
+
     res = attraction.add_critique(json)
     if res:
         return jsonify({"message": "Critique ajoutée", "critique_id": res}), 200
     return jsonify({"message": "Erreur lors de l'ajout de la critique"}), 400
 
+@app.post('/critique/batch')
+def addCritiquesBatch():
+    """Ajoute un tableau de critiques en une transaction, avec les erreurs par élément"""
+    json = request.get_json()
+    if (not isinstance(json, list) or len(json) == 0):
+        return jsonify({"message": "Un tableau de critiques est attendu"}), 400
+    if (len(json) > attraction.MAX_CRITIQUES_BATCH):
+        return jsonify({"message": f"Au plus {attraction.MAX_CRITIQUES_BATCH} critiques par envoi"}), 413
+
+    res = attraction.add_critiques_batch(json)
+    if (res["inserted"] == 0):
+        return jsonify({"message": "Aucune critique ajoutée", **res}), 400
+    return jsonify({"message": "Critiques ajoutées", **res}), 200
+
 @app.get('/critique/attraction/<int:attraction_id>')
 def getCritiquesByAttraction(attraction_id):
-    """Récupère toutes les critiques d'une attraction"""
+    """Récupère les critiques d'une attraction, paginées si ?limit= ou ?after= est fourni"""
+    if (is_paginated()):
+        limit, after, erreur = pagination_args()
+        if (erreur):
+            return jsonify({"message": erreur}), 400
+        return jsonify(attraction.get_critiques_page(attraction_id, limit, after)), 200
     result = attraction.get_critiques_by_attraction(attraction_id)
     return jsonify(result), 200
 
+@app.get('/search')
+def searchAll():
+    """Recherche plein texte : ?q= dans les attractions visibles et leurs critiques"""
+    q = request.args.get('q', '')
+    limit = request.args.get('limit', search.DEFAULT_LIMIT, type=int)
+    if (limit < 1 or limit > search.MAX_LIMIT):
+        return jsonify({"message": f"limit doit être compris entre 1 et {search.MAX_LIMIT}"}), 400
+
+    result = search.search(q, limit)
+    if (result is None):
+        return jsonify({"message": f"La recherche doit contenir un mot d'au moins {search.MIN_WORD_LENGTH} lettres"}), 400
+    return jsonify(result), 200
+
+# Export Routes
+def export_response(generator_factory, name):
+    """Réponse en flux d'un export, au format demandé par ?format= (ndjson par défaut)"""
+    checkToken = user.check_token(request)
+    if (checkToken != True):
+        return checkToken
+
+    format = request.args.get('format', 'ndjson')
+    if (format not in export.FORMATS):
+        return jsonify({"message": f"Format inconnu, attendu : {', '.join(export.FORMATS)}"}), 400
+
+    response = Response(stream_with_context(generator_factory(format)), mimetype=export.FORMATS[format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}.{format}"'
+    # Nginx ne doit pas accumuler la réponse avant de la transmettre
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.get('/critique/export')
+def exportCritiques():
+    """Export de toutes les critiques en NDJSON ou CSV, lu et envoyé en flux"""
+    return export_response(export.export_critiques, 'critiques')
+
+@app.get('/attraction/export')
+def exportAttractions():
+    """Export de toutes les attractions en NDJSON ou CSV, lu et envoyé en flux"""
+    return export_response(export.export_attractions, 'attractions')
+
 # Auth Routes
 @app.post('/login')
 def login():
@@ -86,11 +363,10 @@ def login():
         result = jsonify({'messages': ["Nom ou/et mot de passe incorrect"]})
         return result, 400
     
-    cur, conn = req.get_db_connection()
     requete = f"SELECT * FROM users WHERE name = '{json['name']}' AND password = '{json['password']}';"
-    cur.execute(requete)
-    records = cur.fetchall()
-    conn.close()
+    with req.get_db_connection() as (cur, conn):
+        cur.execute(requete)
+        records = cur.fetchall()
 
     if len(records) == 0:
         return jsonify({"message": "Identifiants incorrects"}), 401
@@ -98,5 +374,15 @@ def login():
     result = jsonify({"token": user.encode_auth_token(list(records[0])[0]), "name": json['name']})
     return result, 200
 
+@app.post('/logout')
+def logout():
+    """Révoque le token de la requête jusqu'à son expiration"""
+    checkToken = user.check_token(request)
+    if (checkToken != True):
+        return checkToken
+
+    user.revoke_token(user.get_token(request))
+    return jsonify({"message": "Déconnecté"}), 200
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
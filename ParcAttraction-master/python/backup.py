@@ -4,84 +4,261 @@ Script de backup de la base de données
 Crée un fichier SQL avec toutes les données
 """
 
+import argparse
+import datetime as dt
+import decimal
+import gzip
+import hashlib
+import io
+import json
 import mariadb
+import multiprocessing
+import os
+import re
+import sqlite3
 import sys
+import tempfile
+import time
 from datetime import datetime
 
-def backup_database():
-    """Crée un backup complet de la base de données"""
+# Tables sauvegardées, dans l'ordre de restauration (parents avant enfants)
+# avec la clé primaire qui fixe l'ordre de lecture
+TABLES = [
+    ("attraction", "attraction_id"),
+    ("critique", "critique_id"),
+    ("users", "user_id"),
+    ("attraction_stats", "attraction_id"),
+]
+
+# Nombre de lignes par INSERT multi-lignes
+DEFAULT_BATCH_SIZE = 1000
+# Taille maximale d'un INSERT, pour rester sous max_allowed_packet
+MAX_STATEMENT_BYTES = 4 * 1024 * 1024
+
+COMPRESSIONS = {
+    None: "",
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+def get_connection():
+    return mariadb.connect(
+        user="mysqlusr",
+        password="mysqlpwd",
+        host="database",
+        port=3306,
+        database="parc"
+    )
+
+def open_backup_file(path, mode, compression=None):
+    """Ouvre un fichier de backup en texte, compressé à la volée si demandé
+
+    En lecture, la compression est déduite de l'extension (.gz, .zst).
+    """
+    if compression is None and "r" in mode:
+        if path.endswith(".gz"):
+            compression = "gzip"
+        elif path.endswith(".zst"):
+            compression = "zstd"
+
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("La compression zstd nécessite le paquet 'zstandard' (pip install zstandard)")
+        raw = open(path, mode + "b")
+        if "r" in mode:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "'": "\\'",
+    "\0": "\\0",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\x1a": "\\Z",
+})
+
+def sql_literal(value):
+    """Représentation SQL d'une valeur lue en base"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, (dt.datetime, dt.date, dt.time, dt.timedelta)):
+        return f"'{value}'"
+    if isinstance(value, (bytes, bytearray)):
+        return "X'" + bytes(value).hex() + "'"
+    return "'" + str(value).translate(_ESCAPES) + "'"
+
+def write_inserts(f, prefix, values, suffix=""):
+    """Écrit des tuples déjà formatés en INSERT multi-lignes de moins de MAX_STATEMENT_BYTES"""
+    batch = []
+    size = 0
+    for value in values:
+        if batch and size + len(value) > MAX_STATEMENT_BYTES:
+            f.write(prefix + ",\n".join(batch) + suffix + ";\n")
+            batch = []
+            size = 0
+        batch.append(value)
+        size += len(value) + 2
+    if batch:
+        f.write(prefix + ",\n".join(batch) + suffix + ";\n")
+
+def dump_table(conn, f, table, primary_key, batch_size=DEFAULT_BATCH_SIZE, where="", params=(), upsert=False):
+    """Écrit le contenu d'une table en INSERT multi-lignes, lu par paquets
+
+    Le curseur n'est pas bufferisé : seules `batch_size` lignes sont en mémoire.
+    `where` est ajouté tel quel à la requête (" WHERE ... >= ?" avec `params`).
+    Avec `upsert`, les lignes existantes sont mises à jour (ON DUPLICATE KEY UPDATE).
+    Renvoie le nombre de lignes écrites.
+    """
+    cur = conn.cursor(buffered=False)
+    cur.execute(f"SELECT * FROM {table}{where} ORDER BY {primary_key}", params)
+    columns = [column[0] for column in cur.description]
+    prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES\n"
+    suffix = ""
+    if upsert:
+        suffix = "\nON DUPLICATE KEY UPDATE " + ", ".join(
+            f"{column} = VALUES({column})" for column in columns if column != primary_key
+        )
+
+    count = 0
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        count += len(rows)
+        write_inserts(f, prefix, ("(" + ", ".join(sql_literal(v) for v in row) + ")" for row in rows), suffix)
+
+    cur.close()
+    return count
+
+# Colonne qui date la dernière modification d'une ligne, pour les backups incrémentaux.
+# Une table sans cette colonne (attraction_stats, petite et recalculée) est exportée en entier.
+INCREMENTAL_COLUMNS = {
+    "attraction": "updated_at",
+    "critique": "created_at",
+    "users": "created_at",
+}
+# Marge de recouvrement entre deux backups incrémentaux : une transaction validée
+# juste après le début du backup précédent peut porter une date antérieure
+INCREMENTAL_OVERLAP = dt.timedelta(seconds=60)
+
+BACKUP_STATE_FILE = os.environ.get("BACKUP_STATE_FILE", "backup_state.json")
+
+def load_backup_state():
+    """État de la chaîne de backups : dernier backup complet, incrémentaux suivants et watermark"""
+    try:
+        with open(BACKUP_STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_backup_state(state):
+    with open(BACKUP_STATE_FILE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(BACKUP_STATE_FILE + ".tmp", BACKUP_STATE_FILE)
+
+def _has_column(conn, table, column):
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT 1 FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ? AND COLUMN_NAME = ?",
+        (table, column)
+    )
+    found = cur.fetchone() is not None
+    cur.close()
+    return found
+
+def _write_header(f, full=True):
+    f.write(f"-- Backup {'complet' if full else 'incrémental'} de la base de données 'parc'\n")
+    f.write(f"-- Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    f.write(f"-- ==========================================\n\n")
+    f.write("SET NAMES utf8mb4;\n")
+    
+    if full:
+        # Vidage des tables, enfants avant parents
+        for table, _ in reversed(TABLES):
+            f.write(f"DELETE FROM {table};\n")
+    f.write("\n")
+
+def backup_database(batch_size=DEFAULT_BATCH_SIZE, compression=None, backup_file=None, incremental=False):
+    """Crée un backup de la base de données, table par table en flux
+
+    En mode `incremental`, seules les lignes créées ou modifiées depuis le
+    backup précédent sont exportées, en INSERT ... ON DUPLICATE KEY UPDATE :
+    le fichier s'applique par-dessus le backup complet et les incrémentaux
+    précédents. Les suppressions ne sont pas capturées.
+    """
     
     try:
+        state = load_backup_state()
+        if incremental and not state.get("watermark"):
+            print("⚠️  Aucun backup précédent : backup complet")
+            incremental = False
+        
         print("🔗 Connexion à la base de données...")
-        conn = mariadb.connect(
-            user="mysqlusr",
-            password="mysqlpwd",
-            host="database",
-            port=3306,
-            database="parc"
-        )
+        conn = get_connection()
+        
+        # Début du backup selon l'horloge du serveur : watermark du prochain incrémental
         cur = conn.cursor()
+        cur.execute("SELECT NOW()")
+        started = cur.fetchone()[0]
+        cur.close()
         
         # Nom du fichier backup avec timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_file = f"backup_parc_{timestamp}.sql"
+        if backup_file is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            kind = "_incr" if incremental else ""
+            backup_file = f"backup_parc_{timestamp}{kind}.sql{COMPRESSIONS[compression]}"
         
-        print(f"💾 Création du backup: {backup_file}")
+        if incremental:
+            since = datetime.strptime(state["watermark"], "%Y-%m-%d %H:%M:%S") - INCREMENTAL_OVERLAP
+            print(f"💾 Création du backup incrémental: {backup_file} (depuis {since})")
+        else:
+            print(f"💾 Création du backup: {backup_file}")
+        start = time.monotonic()
+        counts = {}
         
-        with open(backup_file, 'w', encoding='utf-8') as f:
-            f.write(f"-- Backup de la base de données 'parc'\n")
-            f.write(f"-- Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"-- ==========================================\n\n")
-            
-            # Backup des attractions
-            f.write("-- TABLE: attraction\n")
-            f.write("DELETE FROM critique;\n")
-            f.write("DELETE FROM attraction;\n\n")
+        with open_backup_file(backup_file, "w", compression) as f:
+            _write_header(f, full=not incremental)
             
-            cur.execute("SELECT * FROM attraction")
-            attractions = cur.fetchall()
-            
-            if attractions:
-                for attr in attractions:
-                    f.write(f"INSERT INTO attraction (attraction_id, nom, description, difficulte, visible) VALUES ")
-                    f.write(f"({attr[0]}, '{attr[1].replace(chr(39), chr(39)+chr(39))}', ")
-                    f.write(f"'{attr[2].replace(chr(39), chr(39)+chr(39))}', {attr[3]}, {attr[4]});\n")
+            for table, primary_key in TABLES:
+                f.write(f"-- TABLE: {table}\n")
+                column = INCREMENTAL_COLUMNS.get(table) if incremental else None
+                if column and _has_column(conn, table, column):
+                    counts[table] = dump_table(conn, f, table, primary_key, batch_size,
+                                               f" WHERE {column} >= ?", (since,), upsert=True)
+                else:
+                    counts[table] = dump_table(conn, f, table, primary_key, batch_size, upsert=incremental)
                 f.write("\n")
-            
-            # Backup des critiques
-            f.write("-- TABLE: critique\n")
-            cur.execute("SELECT * FROM critique")
-            critiques = cur.fetchall()
-            
-            if critiques:
-                for crit in critiques:
-                    nom = crit[1].replace("'", "''") if crit[1] else ''
-                    prenom = crit[2].replace("'", "''") if crit[2] else ''
-                    commentaire = crit[4].replace("'", "''") if crit[4] else ''
-                    
-                    f.write(f"INSERT INTO critique (attraction_id, nom, prenom, note, commentaire, est_anonyme) VALUES ")
-                    f.write(f"({crit[0]}, '{nom}', '{prenom}', {crit[3]}, '{commentaire}', {crit[5]});\n")
-                f.write("\n")
-            
-            # Backup des users
-            f.write("-- TABLE: users\n")
-            cur.execute("SELECT * FROM users")
-            users = cur.fetchall()
-            
-            if users:
-                for user in users:
-                    email = user[3].replace("'", "''") if user[3] else ''
-                    f.write(f"INSERT INTO users (user_id, name, password, email) VALUES ")
-                    f.write(f"({user[0]}, '{user[1]}', '{user[2]}', '{email}');\n")
         
-        cur.close()
         conn.close()
+        duration = time.monotonic() - start
+        total = sum(counts.values())
+        
+        if incremental:
+            state["chain"] = state.get("chain", []) + [backup_file]
+        else:
+            state = {"base": backup_file, "chain": []}
+        state["watermark"] = started.strftime("%Y-%m-%d %H:%M:%S")
+        save_backup_state(state)
         
         print(f"✅ Backup créé avec succès: {backup_file}")
         print(f"\n📋 Statistiques:")
-        print(f"   - {len(attractions)} attractions")
-        print(f"   - {len(critiques)} critiques")
-        print(f"   - {len(users)} utilisateurs")
+        for table, count in counts.items():
+            print(f"   - {table}: {count} lignes")
+        print(f"   - {total} lignes en {duration:.1f}s ({total / max(duration, 0.001):.0f} lignes/s)")
         
         return backup_file
         
@@ -92,39 +269,217 @@ def backup_database():
         print(f"❌ Erreur: {e}")
         return None
 
-def restore_from_backup(backup_file):
-    """Restaure la base de données depuis un fichier backup"""
+# Lecture du dump par morceaux de 1 Mo
+READ_CHUNK_SIZE = 1 << 20
+# Nombre d'instructions par transaction lors de la restauration
+DEFAULT_COMMIT_EVERY = 100
+PROGRESS_INTERVAL = 5.0
+
+_SPECIAL = re.compile(r"[;'\"`#/-]")
+_CLOSING = {
+    "'": re.compile(r"[\\']"),
+    '"': re.compile(r'[\\"]'),
+    "`": re.compile(r"`"),
+}
+
+def iter_statements(f, chunk_size=READ_CHUNK_SIZE):
+    """Découpe un flux SQL en instructions, sans le charger en entier
+
+    Un ; dans une chaîne ('...', "...", `...`) ou un commentaire ne coupe pas
+    l'instruction. Les commentaires (--, #, /* */) sont retirés, sauf les
+    commentaires exécutables /*! ... */.
+    Génère des couples (instruction, position en caractères après l'instruction).
+    """
+    buf = ""
+    pieces = []   # morceaux de l'instruction en cours, hors commentaires
+    seg = 0       # début du morceau en cours dans buf
+    pos = 0       # position d'analyse dans buf
+    consumed = 0  # caractères déjà retirés de buf
+    eof = False
+
+    while True:
+        m = _SPECIAL.search(buf, pos)
+        if m is not None:
+            j = m.start()
+            c = buf[j]
+            # Fin de l'élément analysé, None s'il faut lire la suite du flux
+            end = None
+
+            if c == ";":
+                pieces.append(buf[seg:j])
+                statement = "".join(pieces).strip()
+                pieces = []
+                seg = pos = j + 1
+                if statement:
+                    yield statement, consumed + pos
+                continue
+
+            if c in _CLOSING:
+                k = j + 1
+                closing = _CLOSING[c]
+                while True:
+                    q = closing.search(buf, k)
+                    if q is None:
+                        break
+                    k = q.start()
+                    if buf[k] == "\\":
+                        if k + 1 >= len(buf):
+                            break
+                        k += 2
+                    elif k + 1 < len(buf) and buf[k + 1] == c:
+                        k += 2
+                    elif k + 1 < len(buf) or eof:
+                        end = k + 1
+                        break
+                    else:
+                        break
+                if end is not None:
+                    pos = end
+                    continue
+
+            elif c == "-" or c == "#":
+                if c == "-" and j + 2 >= len(buf) and not eof:
+                    pass
+                elif c == "-" and not (buf[j + 1:j + 2] == "-" and buf[j + 2:j + 3] in ("", " ", "\t", "\r", "\n")):
+                    pos = j + 1
+                    continue
+                else:
+                    e = buf.find("\n", j)
+                    if e >= 0 or eof:
+                        pieces.append(buf[seg:j])
+                        seg = pos = e if e >= 0 else len(buf)
+                        continue
+
+            else:  # "/"
+                if j + 2 >= len(buf) and not eof:
+                    pass
+                elif buf[j + 1:j + 2] != "*" or buf[j + 2:j + 3] == "!":
+                    pos = j + 1
+                    continue
+                else:
+                    e = buf.find("*/", j + 2)
+                    if e >= 0:
+                        pieces.append(buf[seg:j] + " ")
+                        seg = pos = e + 2
+                        continue
+
+            if eof:
+                # Chaîne ou commentaire non terminé : le reste du flux lui appartient
+                pos = len(buf)
+                break
+            pos = j
+        elif eof:
+            break
+
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+            continue
+        # Le texte déjà découpé est oublié : le tampon reste de la taille d'une instruction
+        buf = buf[seg:] + chunk
+        consumed += seg
+        pos = max(pos - seg, 0)
+        seg = 0
+
+    pieces.append(buf[seg:])
+    statement = "".join(pieces).strip()
+    if statement:
+        yield statement, consumed + len(buf)
+
+def _state_file(backup_file):
+    return backup_file + ".restore-state"
+
+def _load_restore_state(backup_file):
+    try:
+        with open(_state_file(backup_file), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _save_restore_state(backup_file, statements, position):
+    """Écrit l'avancement de façon atomique, après chaque COMMIT"""
+    path = _state_file(backup_file)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"statements": statements, "position": position}, f)
+    os.replace(path + ".tmp", path)
+
+def restore_from_backup(backup_file, commit_every=DEFAULT_COMMIT_EVERY, resume=False):
+    """Restaure la base de données depuis un fichier backup, lu en flux
+
+    Les instructions sont exécutées par transactions de `commit_every`, clés
+    étrangères désactivées. L'avancement est enregistré après chaque COMMIT :
+    avec `resume`, une restauration interrompue reprend après la dernière
+    transaction validée.
+    """
     
+    conn = None
     try:
+        skip = 0
+        state = _load_restore_state(backup_file)
+        if state is not None:
+            if resume:
+                skip = state["statements"]
+                print(f"↩️  Reprise après {skip} instructions déjà validées")
+            else:
+                print("⚠️  Restauration précédente interrompue : reprise possible avec --resume, on recommence du début")
+        
         print(f"🔗 Connexion à la base de données...")
-        conn = mariadb.connect(
-            user="mysqlusr",
-            password="mysqlpwd",
-            host="database",
-            port=3306,
-            database="parc"
-        )
+        conn = get_connection()
+        conn.autocommit = False
         cur = conn.cursor()
+        cur.execute("SET FOREIGN_KEY_CHECKS = 0")
+        cur.execute("SET UNIQUE_CHECKS = 0")
         
-        print(f"📂 Lecture du fichier: {backup_file}")
-        with open(backup_file, 'r', encoding='utf-8') as f:
-            sql_commands = f.read()
+        # Pourcentage affiché seulement si la taille du texte est connue
+        total = None if backup_file.endswith((".gz", ".zst")) else os.path.getsize(backup_file)
         
-        # Exécuter les commandes SQL
+        print(f"📂 Lecture du fichier: {backup_file}")
         print("⚙️  Restauration en cours...")
-        for command in sql_commands.split(';'):
-            command = command.strip()
-            if command and not command.startswith('--'):
+        start = time.monotonic()
+        last_report = start
+        executed = 0
+        pending = 0
+        count = 0
+        position = 0
+        
+        with open_backup_file(backup_file, "r") as f:
+            for statement, position in iter_statements(f):
+                count += 1
+                if count <= skip:
+                    # Les réglages de session doivent être rejoués à la reprise
+                    if statement[:4].upper() != "SET ":
+                        continue
                 try:
-                    cur.execute(command)
+                    cur.execute(statement)
                 except mariadb.Error as e:
-                    print(f"⚠️  Erreur sur commande: {e}")
+                    conn.rollback()
+                    print(f"❌ Erreur sur l'instruction {count}: {e}")
+                    print(f"   {statement[:200]}")
+                    print("   Relancer avec --resume après correction pour reprendre à la dernière transaction validée")
+                    return False
+                executed += 1
+                pending += 1
+                
+                if pending >= commit_every:
+                    conn.commit()
+                    _save_restore_state(backup_file, count, position)
+                    pending = 0
+                    now = time.monotonic()
+                    if now - last_report >= PROGRESS_INTERVAL:
+                        last_report = now
+                        _report_progress(count, position, total, now - start)
         
         conn.commit()
+        cur.execute("SET UNIQUE_CHECKS = 1")
+        cur.execute("SET FOREIGN_KEY_CHECKS = 1")
         cur.close()
-        conn.close()
         
-        print("✅ Restauration terminée!")
+        if os.path.exists(_state_file(backup_file)):
+            os.remove(_state_file(backup_file))
+        
+        duration = time.monotonic() - start
+        print(f"✅ Restauration terminée! {executed} instructions en {duration:.1f}s "
+              f"({position / 1e6 / max(duration, 0.001):.1f} Mo/s)")
         return True
         
     except mariadb.Error as e:
@@ -136,12 +491,426 @@ def restore_from_backup(backup_file):
     except Exception as e:
         print(f"❌ Erreur: {e}")
         return False
+    finally:
+        if conn is not None:
+            conn.close()
+
+def _report_progress(count, position, total, elapsed):
+    message = f"⏳ {count} instructions, {position / 1e6:.1f} Mo"
+    if total:
+        message += f" ({min(position / total, 1):.0%})"
+    print(f"{message} - {position / 1e6 / max(elapsed, 0.001):.1f} Mo/s", flush=True)
+
+# Taille visée d'une tranche de clé primaire pour le backup parallèle
+DEFAULT_CHUNK_ROWS = 200000
+MANIFEST_FILE = "manifest.json"
+RESTORE_STATE_FILE = "restore-state.json"
+# Avancement d'une restauration de plusieurs fichiers, à côté du premier
+CHAIN_STATE_SUFFIX = ".chain-state"
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _key_ranges(cur, table, primary_key, chunk_rows):
+    """Découpe la table en tranches de clé primaire d'environ `chunk_rows` lignes
+
+    Le nombre de lignes est estimé par MIN/MAX (lus sur l'index, sans COUNT(*)).
+    La première et la dernière tranche sont ouvertes.
+    """
+    cur.execute(f"SELECT MIN({primary_key}), MAX({primary_key}) FROM {table}")
+    low, high = cur.fetchone()
+    if low is None or high - low + 1 <= chunk_rows:
+        return [(None, None)]
+    parts = -(-(high - low + 1) // chunk_rows)
+    step = -(-(high - low + 1) // parts)
+    bounds = [low + i * step for i in range(1, parts)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+def _snapshot_worker(tasks, results, ready, directory, batch_size, compression):
+    """Processus de dump : ouvre sa transaction pendant que les tables sont verrouillées,
+    puis exporte les tranches reçues depuis ce même instantané"""
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cur.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        cur.close()
+    except mariadb.Error as e:
+        ready.put(f"{e}")
+        return
+    ready.put(None)
+    
+    for table, primary_key, part, low, high in iter(tasks.get, None):
+        path = os.path.join(directory, f"{table}.{part:04d}.sql{COMPRESSIONS[compression]}")
+        conditions = []
+        params = []
+        if low is not None:
+            conditions.append(f"{primary_key} >= ?")
+            params.append(low)
+        if high is not None:
+            conditions.append(f"{primary_key} < ?")
+            params.append(high)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        try:
+            with open_backup_file(path, "w", compression) as f:
+                f.write("SET NAMES utf8mb4;\n")
+                rows = dump_table(conn, f, table, primary_key, batch_size, where, tuple(params))
+            results.put({"file": os.path.basename(path), "table": table, "rows": rows,
+                         "bytes": os.path.getsize(path), "sha256": _file_sha256(path)})
+        except Exception as e:
+            results.put({"file": os.path.basename(path), "table": table, "error": f"{e}"})
+    
+    conn.close()
+
+def parallel_backup(directory=None, workers=4, chunk_rows=DEFAULT_CHUNK_ROWS,
+                    batch_size=DEFAULT_BATCH_SIZE, compression=None):
+    """Backup en parallèle : un fichier par table ou par tranche de clé primaire
+
+    Les tables sont verrouillées en lecture le temps que chaque processus ouvre
+    une transaction START TRANSACTION WITH CONSISTENT SNAPSHOT : tous exportent
+    alors exactement le même état de la base. Le répertoire contient un
+    manifest.json (fichiers dans l'ordre de restauration, lignes, sha256).
+    """
+    
+    if directory is None:
+        directory = f"backup_parc_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    
+    context = multiprocessing.get_context("spawn")
+    tasks = context.Queue()
+    results = context.Queue()
+    ready = context.Queue()
+    processes = []
+    conn = None
+    
+    try:
+        os.makedirs(directory)
+        print("🔗 Connexion à la base de données...")
+        conn = get_connection()
+        cur = conn.cursor()
+        
+        print(f"💾 Création du backup parallèle: {directory} ({workers} processus)")
+        start = time.monotonic()
+        cur.execute("LOCK TABLES " + ", ".join(f"{table} READ" for table, _ in TABLES))
+        try:
+            for _ in range(workers):
+                process = context.Process(target=_snapshot_worker,
+                                          args=(tasks, results, ready, directory, batch_size, compression))
+                process.start()
+                processes.append(process)
+            for _ in processes:
+                error = ready.get(timeout=60)
+                if error is not None:
+                    raise RuntimeError(f"Ouverture de l'instantané impossible: {error}")
+            
+            cur.execute("SELECT NOW()")
+            snapshot = cur.fetchone()[0]
+            ranges = {table: _key_ranges(cur, table, primary_key, chunk_rows) for table, primary_key in TABLES}
+        finally:
+            cur.execute("UNLOCK TABLES")
+        print(f"🔒 Tables verrouillées {(time.monotonic() - start) * 1000:.0f} ms")
+        cur.close()
+        conn.close()
+        conn = None
+        
+        # Les tables découpées en plus de tranches partent en premier
+        work = [(table, primary_key, part, low, high)
+                for table, primary_key in sorted(TABLES, key=lambda t: -len(ranges[t[0]]))
+                for part, (low, high) in enumerate(ranges[table])]
+        for task in work:
+            tasks.put(task)
+        for _ in processes:
+            tasks.put(None)
+        
+        # Vidage des tables, enfants avant parents, avant toute insertion
+        header = "000_header.sql"
+        with open(os.path.join(directory, header), "w", encoding="utf-8") as f:
+            _write_header(f, full=True)
+        
+        entries = {}
+        errors = []
+        for _ in work:
+            entry = results.get()
+            if "error" in entry:
+                errors.append(entry)
+                print(f"❌ {entry['file']}: {entry['error']}")
+            else:
+                entries[entry["file"]] = entry
+        for process in processes:
+            process.join()
+        if errors:
+            return None
+        
+        # Ordre de restauration : en-tête, puis les tables parents avant les enfants
+        files = [{"file": header, "table": None, "rows": 0,
+                  "bytes": os.path.getsize(os.path.join(directory, header)),
+                  "sha256": _file_sha256(os.path.join(directory, header))}]
+        counts = {}
+        for table, primary_key in TABLES:
+            parts = sorted((entry for entry in entries.values() if entry["table"] == table), key=lambda e: e["file"])
+            files.extend(parts)
+            counts[table] = sum(entry["rows"] for entry in parts)
+        
+        manifest = {
+            "snapshot": snapshot.strftime("%Y-%m-%d %H:%M:%S"),
+            "compression": compression,
+            "tables": counts,
+            "files": files,
+        }
+        with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        
+        duration = time.monotonic() - start
+        total = sum(counts.values())
+        print(f"✅ Backup créé avec succès: {directory}")
+        print(f"\n📋 Statistiques:")
+        for table, count in counts.items():
+            print(f"   - {table}: {count} lignes ({len(ranges[table])} fichiers)")
+        print(f"   - {total} lignes en {duration:.1f}s ({total / max(duration, 0.001):.0f} lignes/s)")
+        return directory
+        
+    except mariadb.Error as e:
+        print(f"❌ Erreur MariaDB: {e}")
+        return None
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        return None
+    finally:
+        if conn is not None:
+            conn.close()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+def _load_sequence_state(state_path):
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _save_sequence_state(state_path, paths, done):
+    with open(state_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"paths": paths, "done": done}, f)
+    os.replace(state_path + ".tmp", state_path)
+
+def restore_sequence(paths, state_path, commit_every=DEFAULT_COMMIT_EVERY, resume=False):
+    """Restaure plusieurs fichiers (ou répertoires) dans l'ordre, comme un seul ensemble
+
+    Les chemins terminés sont enregistrés dans `state_path`. Avec `resume`, ils ne
+    sont pas rejoués (un fichier complet commence par vider les tables) : seul
+    l'élément interrompu reprend, depuis sa dernière transaction validée.
+    """
+    paths = [os.path.abspath(path) for path in paths]
+    done = []
+    if resume:
+        state = _load_sequence_state(state_path)
+        if state is None:
+            print(f"❌ Aucune restauration interrompue à reprendre ({state_path} absent)")
+            return False
+        if state["paths"] != paths:
+            print("❌ Les fichiers demandés ne correspondent pas à la restauration interrompue")
+            return False
+        done = state["done"]
+    elif os.path.exists(state_path):
+        print("⚠️  Restauration précédente interrompue : reprise possible avec --resume, on recommence du début")
+    # Écrit avant de commencer : une interruption dès le premier fichier reste reprenable
+    _save_sequence_state(state_path, paths, done)
+
+    for path in paths:
+        if path in done:
+            print(f"⏭️  Déjà restauré: {path}")
+            continue
+        restore = restore_directory if os.path.isdir(path) else restore_from_backup
+        if not restore(path, commit_every, resume):
+            return False
+        # Les éléments suivants n'avaient pas commencé : pas de reprise pour eux
+        resume = False
+        done.append(path)
+        _save_sequence_state(state_path, paths, done)
+
+    os.remove(state_path)
+    return True
+
+def restore_directory(directory, commit_every=DEFAULT_COMMIT_EVERY, resume=False):
+    """Restaure un backup parallèle : vérifie les sommes sha256 du manifeste puis
+    restaure les fichiers dans l'ordre du manifeste
+
+    L'avancement est enregistré dans le répertoire (RESTORE_STATE_FILE) : avec
+    `resume`, les fichiers déjà restaurés ne sont pas rejoués.
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        print(f"❌ Manifeste non trouvé dans {directory}")
+        return False
+    
+    print(f"🔎 Vérification de {len(manifest['files'])} fichiers (instantané du {manifest['snapshot']})")
+    for entry in manifest["files"]:
+        path = os.path.join(directory, entry["file"])
+        if not os.path.exists(path) or _file_sha256(path) != entry["sha256"]:
+            print(f"❌ Fichier absent ou corrompu: {entry['file']}")
+            return False
+    
+    return restore_sequence(
+        [os.path.join(directory, entry["file"]) for entry in manifest["files"]],
+        os.path.join(directory, RESTORE_STATE_FILE), commit_every, resume
+    )
+
+
+_INSERT = re.compile(r"INSERT INTO (\w+) \(([^)]*)\) VALUES\s*", re.IGNORECASE)
+_TUPLE = re.compile(r"\s*(\((?:'(?:[^'\\]|\\.|'')*'|[^'()])*\))\s*(,?)")
+_FIELD = re.compile(r"\s*('(?:[^'\\]|\\.|'')*'|[^,']+?)\s*(?:,|$)")
+
+def _parse_insert(statement):
+    """Décompose un INSERT multi-lignes écrit par ce script : (table, colonnes, tuples bruts)"""
+    m = _INSERT.match(statement)
+    if m is None:
+        return None
+    rows = []
+    pos = m.end()
+    while True:
+        t = _TUPLE.match(statement, pos)
+        if t is None:
+            break
+        rows.append(t.group(1))
+        pos = t.end()
+        if not t.group(2):
+            break
+    return m.group(1), [column.strip() for column in m.group(2).split(",")], rows
+
+def _tuple_field(row, position):
+    """Valeur SQL brute du champ `position` d'un tuple '(a, b, ...)'"""
+    fields = _FIELD.findall(row[1:-1])
+    return fields[position]
+
+def compact_backups(backup_file=None, compression=None):
+    """Fusionne le backup complet et ses incrémentaux en un nouveau backup complet
+
+    Les lignes sont fusionnées dans une base SQLite temporaire, la dernière
+    version de chaque clé primaire l'emporte : la mémoire ne dépend pas de la
+    taille des tables et la base MariaDB n'est pas sollicitée.
+    """
+    state = load_backup_state()
+    if not state.get("base"):
+        print("❌ Aucun backup complet dans l'état des backups")
+        return None
+    files = [state["base"]] + state.get("chain", [])
+    primary_keys = dict(TABLES)
+    
+    if backup_file is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_file = f"backup_parc_{timestamp}.sql{COMPRESSIONS[compression]}"
+    
+    try:
+        start = time.monotonic()
+        with tempfile.TemporaryDirectory() as tmp:
+            db = sqlite3.connect(os.path.join(tmp, "compact.db"))
+            db.execute("CREATE TABLE rows (tbl TEXT, pk, data TEXT, PRIMARY KEY (tbl, pk)) WITHOUT ROWID")
+            columns = {}
+            
+            for path in files:
+                print(f"📂 Fusion de {path}")
+                with open_backup_file(path, "r") as f:
+                    for statement, _ in iter_statements(f):
+                        parsed = _parse_insert(statement)
+                        if parsed is None:
+                            continue
+                        table, table_columns, rows = parsed
+                        columns[table] = table_columns
+                        position = table_columns.index(primary_keys[table])
+                        db.executemany(
+                            "INSERT OR REPLACE INTO rows VALUES (?, ?, ?)",
+                            ((table, _sort_key(_tuple_field(row, position)), row) for row in rows)
+                        )
+                db.commit()
+            
+            counts = {}
+            with open_backup_file(backup_file, "w", compression) as f:
+                _write_header(f, full=True)
+                for table, _ in TABLES:
+                    f.write(f"-- TABLE: {table}\n")
+                    counts[table] = db.execute("SELECT COUNT(*) FROM rows WHERE tbl = ?", (table,)).fetchone()[0]
+                    if counts[table]:
+                        prefix = f"INSERT INTO {table} ({', '.join(columns[table])}) VALUES\n"
+                        rows = db.execute("SELECT data FROM rows WHERE tbl = ? ORDER BY pk", (table,))
+                        write_inserts(f, prefix, (row[0] for row in rows))
+                    f.write("\n")
+            db.close()
+        
+        save_backup_state({"base": backup_file, "chain": [], "watermark": state["watermark"]})
+        
+        print(f"✅ {len(files)} fichiers fusionnés dans {backup_file} en {time.monotonic() - start:.1f}s")
+        for table, count in counts.items():
+            print(f"   - {table}: {count} lignes")
+        return backup_file
+        
+    except FileNotFoundError as e:
+        print(f"❌ Fichier non trouvé: {e.filename}")
+        return None
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        return None
+
+def _sort_key(literal):
+    # Les clés numériques sont triées comme des nombres
+    return int(literal) if literal.lstrip("-").isdigit() else literal
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Backup et restauration de la base 'parc'")
+    commands = parser.add_subparsers(dest="command")
+
+    backup = commands.add_parser("backup", help="Crée un backup complet (commande par défaut)")
+    backup.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Nombre de lignes par INSERT multi-lignes")
+    backup.add_argument("--compress", choices=["gzip", "zstd"], default=None,
+                        help="Compression à la volée du fichier")
+    backup.add_argument("--output", default=None, help="Nom du fichier de backup")
+    backup.add_argument("--incremental", action="store_true",
+                        help="N'exporte que les lignes créées ou modifiées depuis le backup précédent")
+    backup.add_argument("--parallel", type=int, default=0, metavar="N",
+                        help="Backup dans un répertoire, N processus sur un même instantané")
+    backup.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Taille des tranches de clé primaire en mode --parallel")
+
+    restore = commands.add_parser("restore", help="Restaure un ou plusieurs fichiers de backup, dans l'ordre")
+    restore.add_argument("backup_files", nargs="+")
+    restore.add_argument("--commit-every", type=int, default=DEFAULT_COMMIT_EVERY,
+                         help="Nombre d'instructions par transaction")
+    restore.add_argument("--resume", action="store_true",
+                         help="Reprend une restauration interrompue après la dernière transaction validée")
+
+    compact = commands.add_parser("compact", help="Fusionne le dernier backup complet et ses incrémentaux")
+    compact.add_argument("--compress", choices=["gzip", "zstd"], default=None)
+    compact.add_argument("--output", default=None)
+
+    # Sans commande explicite, on lance un backup
+    if not argv or argv[0] not in ("backup", "restore", "compact", "-h", "--help"):
+        argv = ["backup"] + list(argv)
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "restore":
-        if len(sys.argv) < 3:
-            print("Usage: python3 backup.py restore <fichier_backup.sql>")
+    args = parse_args(sys.argv[1:])
+    if args.command == "restore":
+        if len(args.backup_files) == 1:
+            backup_file = args.backup_files[0]
+            restore = restore_directory if os.path.isdir(backup_file) else restore_from_backup
+            ok = restore(backup_file, args.commit_every, args.resume)
+        else:
+            # Une chaîne (complet + incrémentaux) reprend comme un tout : les fichiers
+            # terminés ne sont pas rejoués, le complet viderait les tables
+            ok = restore_sequence(args.backup_files, args.backup_files[0].rstrip("/") + CHAIN_STATE_SUFFIX,
+                                  args.commit_every, args.resume)
+        if not ok:
             sys.exit(1)
-        restore_from_backup(sys.argv[2])
+    elif args.command == "compact":
+        compact_backups(args.output, args.compress)
+    elif args.parallel:
+        parallel_backup(args.output, args.parallel, args.chunk_rows, args.batch_size, args.compress)
     else:
-        backup_database()
\ No newline at end of file
+        backup_database(args.batch_size, args.compress, args.output, args.incremental)
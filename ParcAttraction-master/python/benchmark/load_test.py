@@ -0,0 +1,344 @@
+"""
+Banc de charge HTTP de l'API
+Envoie un mélange réaliste de lectures et d'écritures (liste des attractions visibles,
+critiques d'une attraction, dépôt de critiques, écritures admin) depuis plusieurs threads,
+puis affiche par route le débit et les latences p50 / p95 / p99.
+
+Cible :
+- un serveur lancé (Gunicorn, Flask ou nginx) : --url http://localhost:5000
+- sans --url, l'application est chargée dans le processus et appelée par le client de
+  test Flask : on mesure l'API et la base sans le serveur HTTP
+
+Lancement depuis le dossier python :
+    python3 -m benchmark.load_test --url http://localhost:5000 --concurrency 20 --duration 30 --output run.json
+    python3 -m benchmark.load_test --compare run.json --output run2.json
+"""
+
+import argparse
+import datetime
+import http.client
+import json
+import random
+import socket
+import ssl
+import subprocess
+import threading
+import time
+import urllib.parse
+
+# Scénarios et poids par défaut : surtout des lectures, comme le trafic du site
+DEFAULT_MIX = {
+    "visible": 40,
+    "visible_critiques": 10,
+    "attraction": 10,
+    "critiques": 25,
+    "post_critique": 10,
+    "admin": 5,
+}
+
+
+class HttpClient:
+    """Client HTTP keep-alive, une connexion par thread"""
+
+    def __init__(self, url, insecure=False):
+        parsed = urllib.parse.urlsplit(url)
+        self.https = parsed.scheme == "https"
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if self.https else 80)
+        self.prefix = parsed.path.rstrip("/")
+        self.context = ssl._create_unverified_context() if insecure else None
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.https:
+                conn = http.client.HTTPSConnection(self.host, self.port, timeout=30, context=self.context)
+            else:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            # Pas de délai de Nagle : il fausserait les petites latences mesurées
+            conn.connect()
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._local.conn = conn
+        return conn
+
+    def request(self, method, path, body=None, headers=None):
+        """Renvoie (code HTTP, corps décodé en JSON ou None)"""
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        conn = self._connection()
+        try:
+            conn.request(method, self.prefix + path, data, headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except (http.client.HTTPException, OSError):
+            # Connexion fermée par le serveur : on en rouvre une au prochain appel
+            conn.close()
+            self._local.conn = None
+            raise
+        return response.status, _json(payload)
+
+
+class InProcessClient:
+    """Appelle l'application Flask dans le processus, sans serveur HTTP"""
+
+    def __init__(self):
+        from app import app
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, _json(response.get_data())
+
+
+def _json(payload):
+    try:
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+class Workload:
+    """Les scénarios : chacun envoie une ou plusieurs requêtes et les enregistre par route"""
+
+    def __init__(self, client, recorder, attraction_ids, token, rng):
+        self.client = client
+        self.recorder = recorder
+        self.attraction_ids = attraction_ids
+        self.token = token
+        self.rng = rng
+
+    def call(self, route, method, path, body=None, headers=None):
+        start = time.perf_counter()
+        try:
+            status, payload = self.client.request(method, path, body, headers)
+        except Exception:
+            status, payload = 0, None
+        self.recorder.record(route, time.perf_counter() - start, status)
+        return status, payload
+
+    def visible(self):
+        self.call("GET /attraction/visible", "GET", "/attraction/visible")
+
+    def visible_critiques(self):
+        self.call("GET /attraction/visible/critiques", "GET", "/attraction/visible/critiques?critiques_limit=5")
+
+    def attraction(self):
+        self.call("GET /attraction/<id>", "GET", f"/attraction/{self.rng.choice(self.attraction_ids)}")
+
+    def critiques(self):
+        attraction_id = self.rng.choice(self.attraction_ids)
+        self.call("GET /critique/attraction/<id>", "GET", f"/critique/attraction/{attraction_id}?limit=50")
+
+    def post_critique(self):
+        self.call("POST /critique", "POST", "/critique", {
+            "attraction_id": self.rng.choice(self.attraction_ids),
+            "nom": "Benchmark",
+            "prenom": "Charge",
+            "note": self.rng.randint(1, 5),
+            "commentaire": "Critique envoyée par le banc de charge",
+            "est_anonyme": False,
+        })
+
+    def admin(self):
+        """Création puis suppression d'une attraction masquée, avec le token admin"""
+        headers = {"Authorization": f"Token {self.token}"}
+        status, payload = self.call("POST /attraction", "POST", "/attraction", {
+            "nom": "Benchmark",
+            "description": "Attraction temporaire du banc de charge",
+            "difficulte": 1,
+            "visible": False,
+        }, headers)
+        if status == 200 and payload and payload.get("result"):
+            self.call("DELETE /attraction/<id>", "DELETE", f"/attraction/{payload['result']}", headers=headers)
+
+
+class Recorder:
+    """Latences et codes HTTP par route, partagés entre les threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+        self.enabled = False
+
+    def record(self, route, duration, status):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.latencies.setdefault(route, []).append(duration)
+            statuses = self.statuses.setdefault(route, {})
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == 0 or status >= 400:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, elapsed):
+        routes = {}
+        for route, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            routes[route] = {
+                "requests": len(latencies),
+                "errors": self.errors.get(route, 0),
+                "statuses": self.statuses[route],
+                "throughput": round(len(latencies) / elapsed, 2),
+                "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+                "p50_ms": _percentile(latencies, 50),
+                "p95_ms": _percentile(latencies, 95),
+                "p99_ms": _percentile(latencies, 99),
+                "max_ms": round(latencies[-1] * 1000, 3),
+            }
+        return routes
+
+
+def _percentile(ordered, p):
+    """Percentile par rang le plus proche, en millisecondes"""
+    index = max(0, min(len(ordered) - 1, -(-len(ordered) * p // 100) - 1))
+    return round(ordered[index] * 1000, 3)
+
+
+def login(client, name, password):
+    status, payload = client.request("POST", "/login", {"name": name, "password": password})
+    if status != 200 or not payload:
+        return None
+    return payload.get("token")
+
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    if text:
+        mix = {name: 0 for name in DEFAULT_MIX}
+        for item in text.split(","):
+            name, weight = item.split("=")
+            if name not in DEFAULT_MIX:
+                raise ValueError(f"Scénario inconnu : {name} (connus : {', '.join(DEFAULT_MIX)})")
+            mix[name] = float(weight)
+    return mix
+
+
+def run(client, mix, concurrency, duration, warmup, seed, token):
+    """Lance `concurrency` threads pendant `warmup` puis `duration` secondes ; renvoie le résultat"""
+    status, payload = client.request("GET", "/attraction/visible")
+    attraction_ids = [a["attraction_id"] for a in payload or [] if isinstance(a, dict)] if status == 200 else []
+    if not attraction_ids:
+        attraction_ids = [1]
+    if token is None:
+        mix = dict(mix, admin=0)
+
+    scenarios = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in scenarios]
+    recorder = Recorder()
+    stop = threading.Event()
+
+    def worker(number):
+        rng = random.Random(seed + number)
+        workload = Workload(client, recorder, attraction_ids, token, rng)
+        while not stop.is_set():
+            getattr(workload, rng.choices(scenarios, weights)[0])()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup)
+    recorder.enabled = True
+    start = time.perf_counter()
+    time.sleep(duration)
+    recorder.enabled = False
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join(30)
+
+    routes = recorder.summary(elapsed)
+    total = sum(route["requests"] for route in routes.values())
+    return {
+        "mix": mix,
+        "elapsed": round(elapsed, 3),
+        "requests": total,
+        "throughput": round(total / elapsed, 2),
+        "errors": sum(route["errors"] for route in routes.values()),
+        "routes": routes,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(result, previous=None):
+    print(f"{result['requests']} requêtes en {result['elapsed']} s : {result['throughput']} req/s, "
+          f"{result['errors']} erreurs")
+    print(f"{'route':<36} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erreurs':>8}")
+    for route, stats in result["routes"].items():
+        print(f"{route:<36} {stats['throughput']:>9} {stats['p50_ms']:>9} {stats['p95_ms']:>9} "
+              f"{stats['p99_ms']:>9} {stats['errors']:>8}")
+        before = (previous or {}).get("routes", {}).get(route)
+        if before:
+            print(f"{'  par rapport à la référence':<36} {_delta(stats['throughput'], before['throughput']):>9} "
+                  f"{_delta(stats['p50_ms'], before['p50_ms']):>9} {_delta(stats['p95_ms'], before['p95_ms']):>9} "
+                  f"{_delta(stats['p99_ms'], before['p99_ms']):>9}")
+
+
+def _delta(value, before):
+    if not before:
+        return "-"
+    return f"{(value - before) / before:+.0%}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de charge HTTP de l'API du parc")
+    parser.add_argument("--url", help="Adresse d'un serveur lancé ; sans --url, appel dans le processus")
+    parser.add_argument("--insecure", action="store_true", help="Accepte un certificat HTTPS auto-signé")
+    parser.add_argument("--concurrency", type=int, default=10, help="Nombre de clients simultanés")
+    parser.add_argument("--duration", type=float, default=30, help="Durée de la mesure en secondes")
+    parser.add_argument("--warmup", type=float, default=5, help="Chauffe avant la mesure en secondes")
+    parser.add_argument("--mix", help="Poids des scénarios, ex : visible=50,critiques=30,post_critique=20 "
+                                      f"(scénarios : {', '.join(DEFAULT_MIX)})")
+    parser.add_argument("--user", default="admin", help="Compte admin pour le scénario admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du tirage des scénarios")
+    parser.add_argument("--output", help="Fichier JSON où enregistrer le résultat")
+    parser.add_argument("--compare", help="Résultat JSON précédent à comparer")
+    args = parser.parse_args(argv)
+
+    client = HttpClient(args.url, args.insecure) if args.url else InProcessClient()
+    token = login(client, args.user, args.password)
+    if token is None:
+        print("Connexion admin impossible : scénario admin désactivé")
+
+    result = run(client, parse_mix(args.mix), args.concurrency, args.duration, args.warmup, args.seed, token)
+    result = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "target": args.url or "in-process",
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "seed": args.seed,
+        **result,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+    print_result(result, previous)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Résultat enregistré dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
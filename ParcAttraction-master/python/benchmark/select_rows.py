@@ -0,0 +1,88 @@
+"""
+Micro-benchmark des modes de résultat de select_from_db / select_rows
+Compare, sans base de données, la conversion de 100 000 lignes de critiques :
+- l'ancienne boucle (test de type sur chaque cellule, un dict par ligne)
+- select_from_db (colonnes date repérées une fois, un dict par ligne)
+- select_rows (colonnes date repérées une fois, des tuples et un en-tête partagé)
+
+Lancement depuis le dossier python : python3 -m benchmark.select_rows [nombre_de_lignes]
+"""
+
+import datetime
+import gc
+import sys
+import time
+import tracemalloc
+
+import request.request as req
+
+# Description au format DB-API : (nom, code de type, ...) comme la renvoie MariaDB
+DESCRIPTION = [
+    ("critique_id", 3), ("attraction_id", 3), ("nom", 253), ("prenom", 253),
+    ("note", 3), ("commentaire", 252), ("est_anonyme", 1), ("created_at", 7),
+]
+
+
+def make_records(count):
+    created_at = datetime.datetime(2024, 6, 1, 14, 30)
+    return [
+        (i, i % 500 + 1, "Dupont", "Marie", i % 5 + 1, "Super attraction, à refaire !", i % 2, created_at)
+        for i in range(count)
+    ]
+
+
+def legacy(description, records):
+    """Ancienne version de select_from_db, gardée comme référence"""
+    field_names = [i[0] for i in description]
+    result = []
+    for record in records:
+        element = {}
+        for key, value in enumerate(record):
+            if type(value) is datetime.datetime:
+                element[field_names[key]] = value.strftime('%m/%d/%Y')
+            else:
+                element[field_names[key]] = value
+        result.append(element)
+    return result
+
+
+def dicts(description, records):
+    """Conversion de select_from_db, hors accès à la base"""
+    return req._rows_to_dicts([i[0] for i in description], records, req._datetime_columns(description))
+
+
+def rows(description, records):
+    """Conversion de select_rows, hors accès à la base"""
+    positions = req._datetime_columns(description)
+    return req.Rows([i[0] for i in description], req._format_datetimes(records, positions))
+
+
+def measure(name, function, records):
+    """Meilleur temps sur 3 essais, puis pic mémoire mesuré à part (tracemalloc ralentit)"""
+    durations = []
+    for _ in range(3):
+        gc.collect()
+        start = time.perf_counter()
+        function(DESCRIPTION, records)
+        durations.append(time.perf_counter() - start)
+    duration = min(durations)
+
+    gc.collect()
+    tracemalloc.start()
+    result = function(DESCRIPTION, records)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(f"{name:<16} {duration * 1000:>10.1f} ms {peak / 1024 / 1024:>10.1f} Mo")
+    return duration
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    records = make_records(count)
+    print(f"{count} lignes, {len(DESCRIPTION)} colonnes")
+    print(f"{'mode':<16} {'temps':>13} {'mémoire max':>13}")
+    reference = measure("ancienne boucle", legacy, records)
+    for name, function in (("select_from_db", dicts), ("select_rows", rows)):
+        duration = measure(name, function, records)
+        print(f"{'':<16} x{reference / duration:.1f} plus rapide que l'ancienne boucle")
@@ -0,0 +1,104 @@
+"""
+Micro-benchmark de la sérialisation et de la compression des réponses JSON
+Construit, sans base de données, une réponse de la forme de /attraction/visible/critiques
+(50 attractions, 10 000 critiques par défaut, textes variés tirés du vocabulaire de init.py)
+et compare :
+- le fournisseur JSON par défaut de Flask (module json) et FastJSONProvider (orjson)
+- la taille du corps brut, compressé en gzip et en brotli (si le module est installé)
+
+Lancement depuis le dossier python : python3 -m benchmark.serialization [nombre_de_critiques]
+"""
+
+import datetime
+import decimal
+import gc
+import random
+import sys
+import time
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import controller.compression as compression
+import controller.json_provider as json_provider
+import init
+
+
+# Vocabulaire de init.py : les commentaires sont des suites de mots tirés au hasard,
+# pour ne pas surestimer la compression avec des textes tous identiques
+VOCABULAIRE = sorted({mot for texte in init.COMMENTAIRES + init.TYPES_ATTRACTION + init.NOMS_ATTRACTION
+                      for mot in texte.split()})
+
+
+def make_payload(critiques, attractions=50, seed=42):
+    """Réponse de /attraction/visible/critiques, reproductible à partir de `seed`"""
+    rng = random.Random(seed)
+    payload = []
+    for a in range(attractions):
+        payload.append({
+            "attraction_id": a + 1,
+            "nom": f"{rng.choice(init.NOMS_ATTRACTION)} {rng.choice(init.NOMS_ATTRACTION)} {a + 1}",
+            "description": f"{rng.choice(init.TYPES_ATTRACTION)} : " + " ".join(rng.choices(VOCABULAIRE, k=rng.randint(5, 20))),
+            "difficulte": rng.randint(1, 5),
+            "visible": True,
+            "note_moyenne": decimal.Decimal(f"{rng.uniform(1, 5):.2f}"),
+            "critiques": [],
+        })
+    for i in range(critiques):
+        anonyme = rng.random() < 0.3
+        date = init.DEFAULT_REFERENCE_DATE - datetime.timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        attraction = payload[rng.randrange(attractions)]
+        attraction["critiques"].append({
+            "critique_id": i + 1,
+            "attraction_id": attraction["attraction_id"],
+            "nom": "Anonyme" if anonyme else rng.choice(init.NOMS),
+            "prenom": "" if anonyme else rng.choice(init.PRENOMS),
+            "note": rng.randint(1, 5),
+            "commentaire": " ".join(rng.choices(VOCABULAIRE, k=rng.randint(3, 40))),
+            "est_anonyme": 1 if anonyme else 0,
+            "created_at": date.strftime('%m/%d/%Y'),
+        })
+    return payload
+
+
+def best_of(function, runs=5):
+    """Meilleur temps sur `runs` essais et dernier résultat"""
+    durations = []
+    for _ in range(runs):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return min(durations), result
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    payload = make_payload(count)
+    app = Flask(__name__)
+    providers = [("json (Flask)", DefaultJSONProvider(app))]
+    if json_provider.ENCODER == "orjson":
+        providers.append(("orjson", json_provider.FastJSONProvider(app)))
+    else:
+        print("orjson non disponible : seul le module json est mesuré")
+
+    print(f"{count} critiques")
+    print(f"{'encodeur':<16} {'temps':>13}")
+    reference = None
+    for name, provider in providers:
+        duration, body = best_of(lambda: provider.dumps(payload))
+        print(f"{name:<16} {duration * 1000:>10.1f} ms")
+        if reference is None:
+            reference = duration
+        else:
+            print(f"{'':<16} x{reference / duration:.1f} plus rapide que json")
+
+    data = (body + "\n").encode()
+    print(f"\n{'encodage':<16} {'taille':>13} {'temps':>13}")
+    print(f"{'aucun':<16} {len(data) / 1024:>10.1f} Ko")
+    for encoding in ("gzip",) + (("br",) if compression.brotli is not None else ()):
+        duration, compressed = best_of(lambda: compression.compress(data, encoding))
+        print(f"{encoding:<16} {len(compressed) / 1024:>10.1f} Ko {duration * 1000:>10.1f} ms"
+              f"  ({len(compressed) / len(data):.0%})")
+    if compression.brotli is None:
+        print("brotli non installé : non mesuré")
@@ -1,4 +1,85 @@
+import atexit
+import datetime
+import os
+
+import mariadb
+
 import request.request as req
+from request.pool import PoolTimeout
+from controller.cache import TTLCache
+from controller.invalidation import SharedInvalidation
+from controller.json_provider import dumps_body
+from controller.pagination import build_page, decode_cursor, encode_cursor
+from controller.snapshot import SnapshotPublisher
+from controller.write_behind import WriteBehindBuffer
+
+# Cache des lectures d'attractions, invalidé par les écritures de ce module
+cache = TTLCache(
+    ttl=float(os.environ.get("ATTRACTION_CACHE_TTL", 30)),
+    max_bytes=int(os.environ.get("ATTRACTION_CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+    serializer=dumps_body
+)
+# Chaque worker Gunicorn a son cache : les invalidations passent par la base
+invalidations = SharedInvalidation(
+    cache,
+    refresh=float(os.environ.get("CACHE_INVALIDATION_REFRESH", 1))
+)
+
+# Instantanés des listes publiques (SNAPSHOT_DIR), servis par nginx sans passer par
+# Flask ni la base, régénérés après chaque écriture de ce module
+snapshots = None
+if os.environ.get("SNAPSHOT_DIR"):
+    snapshots = SnapshotPublisher(
+        os.environ["SNAPSHOT_DIR"],
+        {
+            "attraction-visible.json": lambda: get_visible_attractions_entry().body,
+            "attraction-visible-critiques.json": lambda: get_visible_attractions_with_critiques_entry().body,
+        },
+        delay=float(os.environ.get("SNAPSHOT_DELAY", 1))
+    )
+    # Premiers fichiers au démarrage : la base a pu changer hors de l'API (init.py, restauration)
+    snapshots.schedule()
+
+def invalidate_attraction(id=None):
+    """Invalide les listes d'attractions, et la fiche `id` si fournie"""
+    _note_ecriture()
+    keys = [('attraction', int(id)), ('stats', int(id))] if id is not None else []
+    invalidations.invalidate(keys, namespaces=('all', 'visible', 'visible_critiques'))
+
+def _note_ecriture():
+    if snapshots is not None:
+        snapshots.schedule()
+
+def _cached(key, loader):
+    """Lecture à travers le cache, après application des invalidations des autres workers"""
+    invalidations.sync()
+    return cache.get_or_load(key, loader)
+
+def _last_modified(timestamps):
+    """Date la plus récente parmi des timestamps Unix"""
+    timestamps = [ts for ts in timestamps if ts is not None]
+    if not timestamps:
+        return None
+    return datetime.datetime.fromtimestamp(int(max(timestamps)), datetime.timezone.utc)
+
+def _pop_last_modified(rows, column='modifie_le'):
+    """Retire la colonne technique `column` (timestamp Unix) des lignes et renvoie la plus récente"""
+    return _last_modified([row.pop(column) for row in rows])
+
+def _lists_last_modified():
+    """Last-Modified des listes, lu en base : identique pour tous les workers
+
+    Dernière modification d'une attraction (visible ou non : un masquage retire une
+    ligne de la liste), dernière critique et dernière suppression (tombstone, dont la
+    plus récente n'est jamais purgée). À lire avant les données : une écriture
+    concurrente donne alors une date trop ancienne, jamais trop récente.
+    """
+    row = req.select_rows(
+        "SELECT (SELECT UNIX_TIMESTAMP(MAX(updated_at)) FROM attraction), "
+        "(SELECT UNIX_TIMESTAMP(MAX(created_at)) FROM critique), "
+        "(SELECT UNIX_TIMESTAMP(MAX(deleted_at)) FROM tombstone)"
+    ).rows[0]
+    return _last_modified(list(row))
 
 def add_attraction(data):
     print(data, flush=True)
@@ -22,57 +103,239 @@ def add_attraction(data):
         requete = "INSERT INTO attraction (nom, description, difficulte, visible) VALUES (?, ?, ?, ?);"
         id = req.insert_in_db(requete, (data["nom"], data["description"], data["difficulte"], data["visible"]))
 
+    invalidate_attraction(id)
     return id
 
 def get_all_attraction():
+    return get_all_attraction_entry().value
+
+def get_all_attraction_entry():
+    return _cached(('all',), _load_all_attraction)
+
+def _load_all_attraction():
+    last_modified = _lists_last_modified()
     json = req.select_from_db("SELECT * FROM attraction")
-    return json
+    return json, last_modified
+
+def get_attractions_page(limit, after=None):
+    """Page d'attractions triées par identifiant, à partir du curseur `after`"""
+    if after is None:
+        rows = req.select_from_db(
+            "SELECT * FROM attraction ORDER BY attraction_id LIMIT ?",
+            (limit + 1,)
+        )
+    else:
+        rows = req.select_from_db(
+            "SELECT * FROM attraction WHERE attraction_id > ? ORDER BY attraction_id LIMIT ?",
+            (after, limit + 1)
+        )
+    return build_page(rows, limit, 'attraction_id')
 
 def get_attraction(id):
     if (not id):
         return False
 
-    json = req.select_from_db("SELECT * FROM attraction WHERE attraction_id = ?", (id,))
+    return get_attraction_entry(id).value
+
+def get_attraction_entry(id):
+    return _cached(('attraction', int(id)), lambda: _load_attraction(id))
+
+def _load_attraction(id):
+    json = req.select_from_db("SELECT *, UNIX_TIMESTAMP(updated_at) AS modifie_le FROM attraction WHERE attraction_id = ?", (id,))
+    last_modified = _pop_last_modified(json)
 
     if len(json) > 0:
-        return json[0]
+        return json[0], last_modified
     else:
-        return []
+        return [], last_modified
+
+# Nombre maximal d'identifiants d'une lecture groupée
+MAX_ATTRACTIONS_BATCH = 100
+# attraction_id est un INT signé
+MAX_ATTRACTION_ID = 2147483647
+
+def parse_attraction_ids(ids):
+    """Valide une liste d'identifiants (liste ou chaîne "1,5,9")
+
+    Renvoie (identifiants sans doublons dans l'ordre reçu, message d'erreur ou None).
+    """
+    if isinstance(ids, str):
+        ids = [id.strip() for id in ids.split(',') if id.strip()]
+    if not isinstance(ids, list) or not ids:
+        return None, "ids doit être une liste non vide d'identifiants"
+
+    resultat = []
+    for id in ids:
+        # Un entier JSON ou une chaîne de chiffres : int() tronquerait 1.9 en 1
+        if isinstance(id, str) and id.isascii() and id.isdigit():
+            id = int(id)
+        if type(id) is not int or id < 1 or id > MAX_ATTRACTION_ID:
+            return None, f"Identifiant invalide : {id}"
+        resultat.append(id)
+
+    resultat = list(dict.fromkeys(resultat))
+    if len(resultat) > MAX_ATTRACTIONS_BATCH:
+        return None, f"{MAX_ATTRACTIONS_BATCH} identifiants au maximum"
+    return resultat, None
+
+def get_attractions_by_ids(ids):
+    """Récupère plusieurs attractions en une requête, dans l'ordre de `ids`
+
+    Les fiches déjà en cache (celles de /attraction/<id>) sont servies directement,
+    les autres sont lues ensemble puis mises en cache. Renvoie le dict
+    {"attractions": [...], "missing": [identifiants introuvables]}.
+    """
+    invalidations.sync()
+    entries = cache.get_or_load_many([('attraction', id) for id in ids], _load_attractions)
+    attractions = []
+    missing = []
+    for id in ids:
+        value = entries[('attraction', id)].value
+        if value:
+            attractions.append(value)
+        else:
+            missing.append(id)
+    return {"attractions": attractions, "missing": missing}
+
+def _load_attractions(keys):
+    """Chargeur groupé du cache : une seule requête IN (...) pour toutes les clés absentes"""
+    ids = [key[1] for key in keys]
+    placeholders = ", ".join("?" * len(ids))
+    json = req.select_from_db(
+        f"SELECT *, UNIX_TIMESTAMP(updated_at) AS modifie_le FROM attraction WHERE attraction_id IN ({placeholders})",
+        tuple(ids)
+    )
+    par_id = {row['attraction_id']: row for row in json}
+
+    # Une attraction absente est mise en cache comme pour _load_attraction : une liste vide
+    resultat = {}
+    for key in keys:
+        row = par_id.get(key[1])
+        if row is None:
+            resultat[key] = ([], _last_modified([]))
+        else:
+            resultat[key] = (row, _last_modified([row.pop('modifie_le')]))
+    return resultat
 
 def delete_attraction(id):
     if (not id):
         return False
 
-    req.delete_from_db("DELETE FROM attraction WHERE attraction_id = ?", (id,))
+    # La suppression laisse une trace (tombstone) pour la synchronisation différentielle
+    with req.transaction() as cur:
+        cur.execute("DELETE FROM attraction WHERE attraction_id = ?", (id,))
+        if (cur.rowcount):
+            cur.execute("INSERT INTO tombstone (entity, entity_id) VALUES ('attraction', ?)", (id,))
+        cur.execute("DELETE FROM tombstone WHERE deleted_at < NOW() - INTERVAL ? DAY", (TOMBSTONE_RETENTION_DAYS,))
+    invalidate_attraction(id)
     return True
 
 def get_visible_attractions():
-    return req.select_from_db("SELECT * FROM attraction WHERE visible = 1")
+    return get_visible_attractions_entry().value
+
+def get_visible_attractions_entry():
+    return _cached(('visible',), _load_visible_attractions)
+
+def _load_visible_attractions():
+    last_modified = _lists_last_modified()
+    json = req.select_from_db(
+        "SELECT a.*, " + _STATS_COLUMNS + " "
+        "FROM attraction a LEFT JOIN attraction_stats s ON s.attraction_id = a.attraction_id "
+        "WHERE a.visible = 1"
+    )
+    for attraction in json:
+        attraction['stats'] = _pop_stats(attraction)
+    return json, last_modified
 
-def get_visible_attractions_with_critiques():
+def get_visible_attractions_with_critiques(critiques_limit=None):
     """Récupère les attractions visibles avec leurs critiques associées"""
+    return get_visible_attractions_with_critiques_entry(critiques_limit).value
+
+def get_visible_attractions_with_critiques_entry(critiques_limit=None):
+    return _cached(
+        ('visible_critiques', critiques_limit),
+        lambda: _load_visible_attractions_with_critiques(critiques_limit)
+    )
+
+def _load_visible_attractions_with_critiques(critiques_limit=None):
+    """Charge les attractions visibles avec leurs critiques associées
+
+    Les critiques sont chargées en une seule requête puis regroupées par attraction.
+    `critiques_limit` borne le nombre de critiques (les plus récentes) par attraction.
+    """
+    last_modified = _lists_last_modified()
     attractions = req.select_from_db("SELECT * FROM attraction WHERE visible = 1")
-    
-    # Pour chaque attraction, récupérer ses critiques
-    for attraction in attractions:
-        critiques = req.select_from_db(
-            "SELECT * FROM critique WHERE attraction_id = ?", 
-            (attraction['attraction_id'],)
+
+    if critiques_limit is None:
+        critiques = req.select_rows(
+            "SELECT c.* FROM critique c "
+            "JOIN attraction a ON a.attraction_id = c.attraction_id "
+            "WHERE a.visible = 1 "
+            "ORDER BY c.attraction_id, c.critique_id"
+        )
+    else:
+        critiques = req.select_rows(
+            "SELECT critique_id, attraction_id, nom, prenom, note, commentaire, est_anonyme, created_at FROM ("
+            "  SELECT c.*, ROW_NUMBER() OVER (PARTITION BY c.attraction_id ORDER BY c.critique_id DESC) AS rang"
+            "  FROM critique c JOIN attraction a ON a.attraction_id = c.attraction_id"
+            "  WHERE a.visible = 1"
+            ") t WHERE rang <= ? "
+            "ORDER BY attraction_id, critique_id",
+            (critiques_limit,)
         )
-        attraction['critiques'] = critiques
-    
-    return attractions
 
-def add_critique(data):
-    """Ajoute une critique pour une attraction"""
-    if not data.get('attraction_id'):
-        return False
-    
-    if not data.get('note') or data.get('note') < 1 or data.get('note') > 5:
-        return False
-    
-    requete = "INSERT INTO critique (attraction_id, nom, prenom, note, commentaire, est_anonyme) VALUES (?, ?, ?, ?, ?, ?)"
-    params = (
+    # Lignes compactes : converties en dict au regroupement
+    position_attraction = critiques.index('attraction_id')
+    colonnes = critiques.columns
+
+    # Regroupement des critiques par attraction
+    critiques_par_attraction = {}
+    for row in critiques:
+        critiques_par_attraction.setdefault(row[position_attraction], []).append(
+            dict(zip(colonnes, row))
+        )
+
+    for attraction in attractions:
+        attraction['critiques'] = critiques_par_attraction.get(attraction['attraction_id'], [])
+
+    return attractions, last_modified
+
+# Taille maximale d'un envoi groupé de critiques
+MAX_CRITIQUES_BATCH = 5000
+
+_CRITIQUE_INSERT = "INSERT INTO critique (attraction_id, nom, prenom, note, commentaire, est_anonyme) VALUES (?, ?, ?, ?, ?, ?)"
+
+# Tailles des colonnes nom, prenom (VARCHAR(255)) et commentaire (TEXT) de la table critique
+MAX_NOM_LENGTH = 255
+MAX_COMMENTAIRE_BYTES = 65535
+
+def validate_critique(data):
+    """Vérifie une critique reçue, renvoie un message d'erreur ou None si elle est valide"""
+    if not isinstance(data, dict):
+        return "La critique doit être un objet"
+
+    if not data.get('attraction_id') or type(data.get('attraction_id')) is not int:
+        return "attraction_id manquant ou invalide"
+
+    note = data.get('note')
+    if type(note) is not int or note < 1 or note > 5:
+        return "La note doit être un entier entre 1 et 5"
+
+    # Mêmes limites que les colonnes : une valeur refusée par MariaDB ferait échouer tout le lot
+    for champ in ('nom', 'prenom'):
+        valeur = data.get(champ)
+        if valeur is not None and (not isinstance(valeur, str) or len(valeur) > MAX_NOM_LENGTH):
+            return f"{champ} doit être une chaîne de {MAX_NOM_LENGTH} caractères au plus"
+
+    commentaire = data.get('commentaire')
+    if commentaire is not None and (not isinstance(commentaire, str)
+                                    or len(commentaire.encode('utf-8')) > MAX_COMMENTAIRE_BYTES):
+        return f"commentaire doit être une chaîne de {MAX_COMMENTAIRE_BYTES} octets au plus"
+
+    return None
+
+def _critique_params(data):
+    return (
         data.get('attraction_id'), 
         data.get('nom', 'Anonyme'), 
         data.get('prenom', ''), 
@@ -80,7 +343,103 @@ def add_critique(data):
         data.get('commentaire', ''), 
         1 if data.get('est_anonyme') else 0
     )
-    return req.insert_in_db(requete, params)
+
+def add_critique(data):
+    """Ajoute une critique pour une attraction"""
+    if validate_critique(data) is not None:
+        return False
+
+    with req.transaction() as cur:
+        cur.execute(_CRITIQUE_INSERT, _critique_params(data))
+        critique_id = cur.lastrowid
+        cur.execute(_STATS_UPSERT, _stats_delta(data.get('attraction_id'), [data.get('note')]))
+
+    invalidate_critiques(data.get('attraction_id'))
+    return critique_id
+
+def add_critiques_batch(items):
+    """Ajoute une liste de critiques en une seule transaction
+
+    Chaque élément est validé comme dans add_critique ; les éléments invalides
+    sont écartés et signalés par leur position dans la liste.
+    Renvoie {"inserted": nombre inséré, "errors": [{"index", "message"}]}.
+    """
+    errors = []
+    valides = []
+    for index, data in enumerate(items):
+        erreur = validate_critique(data)
+        if erreur is not None:
+            errors.append({"index": index, "message": erreur})
+        else:
+            valides.append((index, _critique_params(data)))
+
+    # Une seule requête pour vérifier l'existence de toutes les attractions visées
+    attraction_ids = sorted({params[0] for _, params in valides})
+    if attraction_ids:
+        placeholders = ", ".join("?" * len(attraction_ids))
+        existantes = {row[0] for row in req.select_rows(
+            f"SELECT attraction_id FROM attraction WHERE attraction_id IN ({placeholders})",
+            tuple(attraction_ids)
+        )}
+        for index, params in valides:
+            if params[0] not in existantes:
+                errors.append({"index": index, "message": "Attraction introuvable"})
+        valides = [(index, params) for index, params in valides if params[0] in existantes]
+
+    rows = [params for _, params in valides]
+    if rows:
+        notes_par_attraction = {}
+        for params in rows:
+            notes_par_attraction.setdefault(params[0], []).append(params[3])
+
+        with req.transaction() as cur:
+            cur.executemany(_CRITIQUE_INSERT, rows)
+            cur.executemany(_STATS_UPSERT, [
+                _stats_delta(attraction_id, notes) for attraction_id, notes in notes_par_attraction.items()
+            ])
+
+        invalidate_critiques(*notes_par_attraction)
+
+    errors.sort(key=lambda error: error["index"])
+    return {"inserted": len(rows), "errors": errors}
+
+def _flush_critiques(items):
+    res = add_critiques_batch(items)
+    for error in res["errors"]:
+        print(f"Critique différée rejetée : {error['message']}", flush=True)
+
+def _erreur_transitoire(e):
+    """Base indisponible (connexion perdue, pool saturé) : le lot entier sera réessayé"""
+    return isinstance(e, (PoolTimeout, mariadb.OperationalError, mariadb.InterfaceError))
+
+# Mode write-behind (CRITIQUE_WRITE_BEHIND=1) : les critiques sont acquittées
+# immédiatement et écrites par lots en arrière-plan
+critique_buffer = None
+if os.environ.get("CRITIQUE_WRITE_BEHIND", "0") == "1":
+    critique_buffer = WriteBehindBuffer(
+        _flush_critiques,
+        max_size=int(os.environ.get("CRITIQUE_BUFFER_MAX_SIZE", 10000)),
+        batch_size=int(os.environ.get("CRITIQUE_BUFFER_BATCH_SIZE", 500)),
+        interval=float(os.environ.get("CRITIQUE_BUFFER_INTERVAL", 1)),
+        is_transient=_erreur_transitoire
+    )
+    atexit.register(critique_buffer.close)
+
+def enqueue_critique(data):
+    """Valide une critique et la confie au tampon write-behind (lève BufferFull s'il est plein)"""
+    if validate_critique(data) is not None:
+        return False
+
+    critique_buffer.submit(data)
+    return True
+
+def invalidate_critiques(*attraction_ids):
+    """Invalide ce qui dépend des critiques des attractions `attraction_ids`"""
+    _note_ecriture()
+    invalidations.invalidate(
+        [('stats', int(attraction_id)) for attraction_id in attraction_ids],
+        namespaces=('visible', 'visible_critiques')
+    )
 
 def get_critiques_by_attraction(attraction_id):
     """Récupère toutes les critiques d'une attraction"""
@@ -90,4 +449,168 @@ def get_critiques_by_attraction(attraction_id):
     return req.select_from_db(
         "SELECT * FROM critique WHERE attraction_id = ? ORDER BY critique_id DESC", 
         (attraction_id,)
-    )
\ No newline at end of file
+    )
+
+def get_critiques_page(attraction_id, limit, after=None):
+    """Page de critiques d'une attraction, de la plus récente à la plus ancienne
+
+    Le parcours suit l'index idx_attraction_id (attraction_id, critique_id) :
+    le coût d'une page ne dépend pas de sa position.
+    """
+    if after is None:
+        rows = req.select_from_db(
+            "SELECT * FROM critique WHERE attraction_id = ? ORDER BY critique_id DESC LIMIT ?",
+            (attraction_id, limit + 1)
+        )
+    else:
+        rows = req.select_from_db(
+            "SELECT * FROM critique WHERE attraction_id = ? AND critique_id < ? ORDER BY critique_id DESC LIMIT ?",
+            (attraction_id, after, limit + 1)
+        )
+    return build_page(rows, limit, 'critique_id')
+
+# Agrégats de notes par attraction (table attraction_stats)
+# Tenus à jour par add_critique, reconstructibles depuis la table critique
+
+_STATS_COLUMNS = (
+    "s.nb_critiques, s.somme_notes, s.nb_note_1, s.nb_note_2, s.nb_note_3, "
+    "s.nb_note_4, s.nb_note_5, s.derniere_critique"
+)
+
+_STATS_UPSERT = (
+    "INSERT INTO attraction_stats (attraction_id, nb_critiques, somme_notes, "
+    "nb_note_1, nb_note_2, nb_note_3, nb_note_4, nb_note_5, derniere_critique) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP) "
+    "ON DUPLICATE KEY UPDATE "
+    "nb_critiques = nb_critiques + VALUES(nb_critiques), "
+    "somme_notes = somme_notes + VALUES(somme_notes), "
+    "nb_note_1 = nb_note_1 + VALUES(nb_note_1), "
+    "nb_note_2 = nb_note_2 + VALUES(nb_note_2), "
+    "nb_note_3 = nb_note_3 + VALUES(nb_note_3), "
+    "nb_note_4 = nb_note_4 + VALUES(nb_note_4), "
+    "nb_note_5 = nb_note_5 + VALUES(nb_note_5), "
+    "derniere_critique = VALUES(derniere_critique)"
+)
+
+def _stats_delta(attraction_id, notes):
+    """Paramètres de _STATS_UPSERT pour l'ajout des `notes` à une attraction"""
+    repartition = [0, 0, 0, 0, 0]
+    for note in notes:
+        repartition[note - 1] += 1
+    return (attraction_id, len(notes), sum(notes), *repartition)
+
+def _pop_stats(row):
+    """Retire les colonnes de attraction_stats d'une ligne et les met en forme"""
+    nb_critiques = row.pop('nb_critiques') or 0
+    somme_notes = row.pop('somme_notes') or 0
+    repartition = {str(note): row.pop(f'nb_note_{note}') or 0 for note in range(1, 6)}
+    return {
+        "nb_critiques": nb_critiques,
+        "moyenne": round(somme_notes / nb_critiques, 2) if nb_critiques else None,
+        "repartition": repartition,
+        "derniere_critique": row.pop('derniere_critique'),
+    }
+
+def get_attraction_stats(id):
+    """Statistiques de notes d'une attraction, None si elle n'existe pas"""
+    return get_attraction_stats_entry(id).value
+
+def get_attraction_stats_entry(id):
+    return _cached(('stats', int(id)), lambda: _load_attraction_stats(id))
+
+def _load_attraction_stats(id):
+    json = req.select_from_db(
+        "SELECT a.attraction_id, UNIX_TIMESTAMP(s.derniere_critique) AS modifie_le, " + _STATS_COLUMNS + " "
+        "FROM attraction a LEFT JOIN attraction_stats s ON s.attraction_id = a.attraction_id "
+        "WHERE a.attraction_id = ?",
+        (id,)
+    )
+    last_modified = _pop_last_modified(json)
+    if len(json) == 0:
+        return None, last_modified
+
+    stats = _pop_stats(json[0])
+    stats['attraction_id'] = json[0]['attraction_id']
+    return stats, last_modified
+
+def rebuild_attraction_stats():
+    """Recalcule entièrement attraction_stats depuis la table critique"""
+    with req.transaction() as cur:
+        cur.execute("DELETE FROM attraction_stats")
+        cur.execute(
+            "INSERT INTO attraction_stats (attraction_id, nb_critiques, somme_notes, "
+            "nb_note_1, nb_note_2, nb_note_3, nb_note_4, nb_note_5, derniere_critique) "
+            "SELECT attraction_id, COUNT(*), SUM(note), "
+            "SUM(note = 1), SUM(note = 2), SUM(note = 3), SUM(note = 4), SUM(note = 5), "
+            "MAX(created_at) "
+            "FROM critique GROUP BY attraction_id"
+        )
+        nb_attractions = cur.rowcount
+
+    _note_ecriture()
+    invalidations.invalidate(namespaces=('visible', 'stats'))
+    return nb_attractions
+
+# Synchronisation différentielle (/changes)
+# La version donnée au client est l'heure du serveur lors de sa dernière synchronisation
+
+# Au-delà, les traces de suppression sont purgées : le client doit tout recharger
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get("TOMBSTONE_RETENTION_DAYS", 7))
+# Recouvrement : une transaction validée après la lecture peut porter une date antérieure
+CHANGES_OVERLAP = int(os.environ.get("CHANGES_OVERLAP", 5))
+# Au-delà de ce nombre de critiques, un rechargement complet coûte moins cher
+CHANGES_MAX_CRITIQUES = int(os.environ.get("CHANGES_MAX_CRITIQUES", 5000))
+
+def get_changes(version=None):
+    """Ce qui a changé dans les listes publiques depuis `version`
+
+    Renvoie les attractions visibles ajoutées ou modifiées (avec leurs statistiques),
+    les identifiants des attractions supprimées ou masquées, et les nouvelles critiques.
+    `full` vaut True si le client doit tout recharger (pas de version, version trop
+    ancienne ou trop de changements). Les éléments peuvent être renvoyés deux fois
+    d'une synchronisation à l'autre : le client les applique par identifiant.
+    """
+    maintenant = int(req.select_from_db("SELECT UNIX_TIMESTAMP() AS maintenant")[0]['maintenant'])
+    nouvelle_version = encode_cursor(maintenant)
+
+    depuis = decode_cursor(version) if version else None
+    if (depuis is None or depuis < maintenant - TOMBSTONE_RETENTION_DAYS * 86400):
+        return {"version": nouvelle_version, "full": True}
+    depuis -= CHANGES_OVERLAP
+
+    # Une nouvelle critique fait évoluer les statistiques : l'attraction est renvoyée aussi
+    attractions = req.select_from_db(
+        "SELECT a.*, " + _STATS_COLUMNS + " "
+        "FROM attraction a LEFT JOIN attraction_stats s ON s.attraction_id = a.attraction_id "
+        "WHERE a.updated_at >= FROM_UNIXTIME(?) OR s.derniere_critique >= FROM_UNIXTIME(?)",
+        (depuis, depuis)
+    )
+    supprimees = [attraction['attraction_id'] for attraction in attractions if not attraction['visible']]
+    attractions = [attraction for attraction in attractions if attraction['visible']]
+    for attraction in attractions:
+        attraction['stats'] = _pop_stats(attraction)
+
+    # Les critiques ne sont supprimées qu'avec leur attraction (ON DELETE CASCADE) :
+    # le client les retire en même temps qu'elle, sans trace propre
+    tombstones = req.select_from_db(
+        "SELECT entity_id FROM tombstone WHERE entity = 'attraction' AND deleted_at >= FROM_UNIXTIME(?)",
+        (depuis,)
+    )
+    supprimees += [row['entity_id'] for row in tombstones]
+
+    critiques = req.select_from_db(
+        "SELECT c.* FROM critique c JOIN attraction a ON a.attraction_id = c.attraction_id "
+        "WHERE a.visible = 1 AND c.created_at >= FROM_UNIXTIME(?) "
+        "ORDER BY c.critique_id LIMIT ?",
+        (depuis, CHANGES_MAX_CRITIQUES + 1)
+    )
+    if (len(critiques) > CHANGES_MAX_CRITIQUES):
+        return {"version": nouvelle_version, "full": True}
+
+    return {
+        "version": nouvelle_version,
+        "full": False,
+        "attractions": attractions,
+        "removed_attractions": sorted(set(supprimees)),
+        "critiques": critiques,
+    }
@@ -1,9 +1,28 @@
 import datetime
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
 from flask import jsonify
 import jwt
 
+import request.request as req
+
 key = "AAAAB3NzaC1yc2EAAAADAQABAAABAQC3AXRA84GNbptx2Mr8EWxlHWYUvacaBPDMm2jO8+u0gXMVMiBHtH9DdNYrmOWVbCjPKUuqwup5t3Z7sDWkGQThEWf6+VdfjcEdndM1/WOdAyyMSBGXxCrXkjhXnc/IV1haNEqNZAdt+QjNvODBJH1m4ChTdGhAQupggQaC5zblXgmWGwXK7gxHekWJ02OtZqC6DZsmN6pTo7gJdZzfdS0AXj7yCY2ZSo9OnuDccVklKbq11p7UiF7NB+wmIcOxO9KnnSipHm0uR7d2O/0KNtjIG1GeUgzaWK53WL8tzV8Kek3yoyOmDvFMgULG1HHLWBqjfyaEDGoheIklxlvr7RvZ"
 
+# Cache des tokens déjà vérifiés : empreinte sha256 du token -> date d'expiration (exp)
+# Une session admin ne paie la vérification HS256 qu'à sa première requête
+TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", 1024))
+# Délai maximal avant qu'une révocation faite par un autre worker soit prise en compte
+REVOCATION_REFRESH = float(os.environ.get("AUTH_REVOCATION_REFRESH", 5))
+
+_lock = threading.Lock()
+_verified = OrderedDict()
+_revoked = {}
+_revoked_refreshed_at = None
+_stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "revoked": 0, "invalid": 0}
+
 def encode_auth_token(user_id):
     try:
         payload = {
@@ -12,39 +31,133 @@ def encode_auth_token(user_id):
             'sub': user_id
         }
 
-        testjwt = jwt.encode(
+        return jwt.encode(
             payload,
             key,
             algorithm='HS256'
         )
-        print("'"+testjwt+"'", flush=True)
-        return testjwt
     except Exception as e:
         return e
 
+def token_digest(auth_token):
+    """Clé du cache et de la liste de révocation : le token lui-même n'est jamais conservé"""
+    return hashlib.sha256(auth_token.encode()).hexdigest()
+
 def decode_auth_token(auth_token):
+    digest = token_digest(auth_token)
+    now = time.time()
+    _refresh_revocations(now)
+
+    with _lock:
+        if digest in _revoked:
+            _stats["revoked"] += 1
+            return 'Le token a été révoqué. Veuillez-vous reconnecter.'
+        exp = _verified.get(digest)
+        if exp is not None:
+            if exp > now:
+                _verified.move_to_end(digest)
+                _stats["hits"] += 1
+                return True
+            del _verified[digest]
+            _stats["expired"] += 1
+        _stats["misses"] += 1
+
     try:
         payload = jwt.decode(auth_token, key, algorithms=['HS256'])
-        return True
     except jwt.ExpiredSignatureError as e:
         print(e, flush=True)
         return 'Le token a expiré. Veuillez-vous reconnecter.'
     except jwt.InvalidTokenError as e:
         print(e, flush=True)
+        with _lock:
+            _stats["invalid"] += 1
         return 'Le token est invalide. Veuillez-vous reconnecter.'
 
+    with _lock:
+        _verified[digest] = payload['exp']
+        _verified.move_to_end(digest)
+        while len(_verified) > TOKEN_CACHE_SIZE:
+            _verified.popitem(last=False)
+            _stats["evictions"] += 1
+    return True
+
+def get_token(request):
+    """Token de l'en-tête Authorization ("Token <jwt>"), None s'il est absent"""
+    token = request.headers.get('Authorization', '').replace('Token ', '').replace('"', '').strip()
+    return token or None
+
 # Fonction vérif token
 def check_token(request):
-    if ('Authorization' in request.headers):
-        token = request.headers['Authorization']
-        print("token entier '"+token+"'", flush=True)
-        if (token != ""):
-            token = token.replace('Token ', '').replace('"', '')
-
-            response = decode_auth_token(token)
-            if (response != True):
-                result = jsonify({"message": response})
-                return result, 401
-            return True
+    token = get_token(request)
+    if (token is not None):
+        response = decode_auth_token(token)
+        if (response != True):
+            result = jsonify({"message": response})
+            return result, 401
+        return True
     result = jsonify({"message": "Aucun token"})
     return result, 401
+
+def revoke_token(auth_token):
+    """Révoque un token jusqu'à son expiration, pour tous les workers
+
+    La révocation est enregistrée en base : les autres processus la lisent
+    au plus tard REVOCATION_REFRESH secondes après.
+    """
+    digest = token_digest(auth_token)
+    try:
+        exp = jwt.decode(auth_token, key, algorithms=['HS256'])['exp']
+    except jwt.InvalidTokenError:
+        return False
+
+    with _lock:
+        _verified.pop(digest, None)
+        _revoked[digest] = exp
+    with req.transaction() as cur:
+        cur.execute("DELETE FROM revoked_token WHERE expires_at < NOW()")
+        cur.execute(
+            "INSERT IGNORE INTO revoked_token (digest, expires_at) VALUES (?, FROM_UNIXTIME(?))",
+            (digest, exp)
+        )
+    return True
+
+def _refresh_revocations(now):
+    """Relit toutes les révocations encore valides
+
+    Relecture complète plutôt qu'à partir du dernier identifiant lu : une révocation
+    validée après une autre d'identifiant supérieur serait sinon ignorée jusqu'à `exp`.
+    La table ne contient que les déconnexions des dernières 24 h.
+    """
+    global _revoked_refreshed_at
+    with _lock:
+        if _revoked_refreshed_at is not None and now - _revoked_refreshed_at < REVOCATION_REFRESH:
+            return
+        _revoked_refreshed_at = now
+
+    try:
+        rows = req.select_rows(
+            "SELECT digest, UNIX_TIMESTAMP(expires_at) FROM revoked_token WHERE expires_at > NOW()"
+        )
+    except Exception as e:
+        print(f"Révocations : lecture impossible ({e})", flush=True)
+        return
+
+    with _lock:
+        # Union avec les révocations locales : une révocation n'est jamais annulée
+        for digest, exp in rows:
+            _revoked[digest] = exp
+            _verified.pop(digest, None)
+        # Un token expiré est refusé de toute façon : inutile de le garder
+        for digest in [digest for digest, exp in _revoked.items() if exp is not None and exp <= now]:
+            del _revoked[digest]
+
+def token_cache_stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "size": len(_verified),
+            "max_size": TOKEN_CACHE_SIZE,
+            "revocations": len(_revoked),
+            "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,221 @@
+"""
+Cache mémoire TTL + LRU pour les lectures des contrôleurs
+Les clés sont des tuples dont le premier élément est l'espace de noms
+"""
+
+import collections
+import hashlib
+import json
+import sys
+import threading
+import time
+
+
+class CacheEntry:
+    """Valeur en cache et ses métadonnées HTTP
+
+    `body` est la forme sérialisée de la valeur, calculée au chargement, et
+    `etag` une empreinte de ce corps : un rechargement sans changement garde
+    le même ETag, et tous les workers donnent le même pour les mêmes données.
+    `encoded` garde les versions compressées du corps par encodage (gzip, br).
+    `size` compte la valeur, le corps et ses versions compressées.
+    """
+    __slots__ = ("key", "value", "size", "expires_at", "etag", "last_modified", "body", "encoded")
+
+    def __init__(self, value, size, expires_at, etag, last_modified=None, body=None, key=None):
+        self.key = key
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body = body
+        self.encoded = {}
+
+
+class TTLCache:
+    """Cache borné en taille, les entrées expirent après `ttl` secondes
+
+    `serializer(valeur)` donne le corps (octets) envoyé au client ; son empreinte
+    sert d'ETag. `max_bytes` borne tout ce que garde une entrée : la valeur Python
+    (taille estimée), le corps et ses versions compressées.
+    """
+
+    def __init__(self, ttl=30.0, max_bytes=16 * 1024 * 1024, serializer=None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.serializer = serializer or _serialize
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        # Incrémenté à chaque invalidation : une valeur chargée pendant une
+        # écriture concurrente n'est pas conservée
+        self._epoch = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key):
+        """Retourne l'entrée associée à `key`, ou None si absente ou expirée"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def set(self, key, value, last_modified=None, epoch=None):
+        body = self.serializer(value)
+        size = len(body) + _value_size(value)
+        etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        entry = CacheEntry(value, size, time.monotonic() + self.ttl, etag, last_modified, body, key)
+        if size > self.max_bytes:
+            return entry
+
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            self._evict()
+        return entry
+
+    def encode(self, entry, encoding, compress):
+        """Corps de `entry` compressé par `compress(corps, encoding)`, calculé une fois
+
+        La version compressée est gardée avec l'entrée et compte dans sa taille.
+        """
+        data = entry.encoded.get(encoding)
+        if data is not None:
+            return data
+        data = compress(entry.body, encoding)
+        with self._lock:
+            if encoding in entry.encoded:
+                return entry.encoded[encoding]
+            entry.encoded[encoding] = data
+            entry.size += len(data)
+            if self._entries.get(entry.key) is entry:
+                self._bytes += len(data)
+                self._evict()
+        return data
+
+    def get_or_load(self, key, loader):
+        """Lecture à travers le cache, retourne l'entrée
+
+        `loader()` n'est appelé qu'en cas d'absence et renvoie le couple
+        (valeur, date de dernière modification ou None).
+        """
+        entry = self.get(key)
+        if entry is None:
+            epoch = self._epoch
+            value, last_modified = loader()
+            entry = self.set(key, value, last_modified, epoch)
+        return entry
+
+    def get_or_load_many(self, keys, loader):
+        """Lecture groupée à travers le cache, retourne un dict clé -> entrée
+
+        `loader(absentes)` n'est appelé qu'une fois, avec la liste des clés absentes,
+        et renvoie un dict clé -> (valeur, date de dernière modification ou None)
+        couvrant chacune d'elles.
+        """
+        entries = {}
+        missing = []
+        for key in keys:
+            entry = self.get(key)
+            if entry is None:
+                missing.append(key)
+            else:
+                entries[key] = entry
+        if missing:
+            epoch = self._epoch
+            for key, (value, last_modified) in loader(missing).items():
+                entries[key] = self.set(key, value, last_modified, epoch)
+        return entries
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._epoch += 1
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+                    self._invalidations += 1
+
+    def invalidate_namespace(self, namespace):
+        """Supprime toutes les clés dont le premier élément est `namespace`"""
+        with self._lock:
+            self._epoch += 1
+            for key in [k for k in self._entries if k[0] == namespace]:
+                self._remove(key)
+                self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _evict(self):
+        """Éviction des entrées les moins récemment utilisées"""
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+
+def _value_size(value):
+    """Taille mémoire estimée de `value` (dicts, listes, tuples et scalaires)
+
+    Un objet partagé (nom de colonne, petit entier) n'est compté qu'une fois.
+    """
+    seen = set()
+    size = 0
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+    return size
+
+
+def _serialize(value):
+    """Sérialisation par défaut : JSON à clés triées, pour un ETag stable"""
+    return (json.dumps(value, default=str, sort_keys=True) + "\n").encode()
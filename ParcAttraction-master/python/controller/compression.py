@@ -0,0 +1,62 @@
+"""
+Compression des réponses selon Accept-Encoding (brotli si le module est installé, sinon gzip)
+Les petites réponses, les flux (exports) et les types déjà compressés sont envoyés tels quels.
+"""
+
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 5))
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+_COMPRESSIBLE = ("application/json", "text/")
+
+
+def negotiate(request):
+    """Meilleur encodage accepté par le client parmi ceux disponibles, ou None"""
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, GZIP_LEVEL)
+
+
+def set_encoded(response, data, encoding):
+    """Remplace le corps par sa version compressée et ajuste les en-têtes"""
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    # Le corps envoyé n'est plus celui de l'ETag fort : comparaison faible seulement
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(request, response):
+    """Compresse la réponse si le client l'accepte et qu'elle en vaut la peine"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or not response.mimetype.startswith(_COMPRESSIBLE)):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate(request)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < MIN_SIZE:
+        return response
+    set_encoded(response, compress(data, encoding), encoding)
+    return response
@@ -0,0 +1,66 @@
+"""
+Export en flux des tables (NDJSON ou CSV)
+Les lignes sont lues et envoyées par paquets : la mémoire reste constante quelle que soit la taille de la table
+"""
+
+import csv
+import datetime
+import decimal
+import io
+import json
+
+import request.request as req
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+CHUNK_SIZE = 1000
+
+
+def export_critiques(format):
+    return export_query("SELECT * FROM critique ORDER BY critique_id", format)
+
+
+def export_attractions(format):
+    return export_query("SELECT * FROM attraction ORDER BY attraction_id", format)
+
+
+def export_query(requete, format, data=()):
+    """Générateur de l'export d'une requête, un morceau de texte par paquet de lignes"""
+    chunks = req.stream_from_db(requete, data, CHUNK_SIZE)
+    field_names = next(chunks)
+
+    if format == "csv":
+        yield _csv_lines([field_names])
+        for rows in chunks:
+            yield _csv_lines([[_csv_value(value) for value in row] for row in rows])
+    else:
+        for rows in chunks:
+            yield "".join(
+                json.dumps(dict(zip(field_names, row)), default=_json_default, ensure_ascii=False) + "\n"
+                for row in rows
+            )
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    raise TypeError(f"Type non sérialisable : {type(value).__name__}")
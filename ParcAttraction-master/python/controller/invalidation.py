@@ -0,0 +1,135 @@
+"""
+Invalidation du cache partagée entre les workers Gunicorn
+Chaque processus a son propre cache : une écriture est enregistrée dans la table
+cache_invalidation, que les autres workers relisent (par identifiant croissant, en
+relisant les identifiants sautés) pour invalider les mêmes clés chez eux.
+"""
+
+import threading
+import time
+
+import request.request as req
+
+GAP_TIMEOUT = 10.0
+
+
+class SharedInvalidation:
+    """Invalide des clés de `cache` dans ce processus et, via la base, dans les autres
+
+    Les autres workers appliquent l'invalidation au plus `refresh` secondes après,
+    à leur prochaine lecture (sync). Les lignes plus anciennes que `retention`
+    secondes sont purgées : elles ne concernent plus que des entrées expirées.
+    """
+
+    def __init__(self, cache, refresh=1.0, retention=3600):
+        self.cache = cache
+        self.refresh = refresh
+        self.retention = retention
+
+        self._lock = threading.Lock()
+        self._last_id = None
+        self._synced_at = None
+        # Invalidations écrites par ce processus, déjà appliquées localement
+        self._own = set()
+        # Identifiants sautés (transaction pas encore validée au moment de la lecture),
+        # relus aux synchronisations suivantes pendant GAP_TIMEOUT secondes
+        self._gaps = {}
+
+        self._published = 0
+        self._applied = 0
+        self._failures = 0
+
+    def invalidate(self, keys=(), namespaces=()):
+        """Invalide les clés `keys` (namespace, identifiant) et les espaces de noms `namespaces`"""
+        self.cache.invalidate(*keys)
+        for namespace in namespaces:
+            self.cache.invalidate_namespace(namespace)
+
+        rows = [(key[0], key[1]) for key in keys] + [(namespace, None) for namespace in namespaces]
+        try:
+            with req.transaction() as cur:
+                ids = []
+                for namespace, item_id in rows:
+                    cur.execute(
+                        "INSERT INTO cache_invalidation (namespace, item_id) VALUES (?, ?)",
+                        (namespace, item_id)
+                    )
+                    ids.append(cur.lastrowid)
+                cur.execute(
+                    "DELETE FROM cache_invalidation WHERE created_at < NOW() - INTERVAL ? SECOND",
+                    (self.retention,)
+                )
+        except Exception as e:
+            # Les autres workers retrouveront la bonne valeur à l'expiration du TTL
+            print(f"Invalidation partagée impossible ({e})", flush=True)
+            with self._lock:
+                self._failures += 1
+            return
+        with self._lock:
+            self._own.update(ids)
+            self._published += len(ids)
+
+    def sync(self):
+        """Applique les invalidations des autres workers, au plus une fois par `refresh` secondes"""
+        now = time.monotonic()
+        with self._lock:
+            if self._synced_at is not None and now - self._synced_at < self.refresh:
+                return
+            self._synced_at = now
+            last_id = self._last_id
+            gaps = {gap: seen for gap, seen in self._gaps.items() if now - seen < GAP_TIMEOUT}
+            self._gaps = gaps
+            gap_ids = list(gaps)
+
+        try:
+            if last_id is None:
+                # Au démarrage le cache est vide : seules les invalidations à venir comptent
+                rows = req.select_rows("SELECT COALESCE(MAX(invalidation_id), 0), NULL, NULL FROM cache_invalidation")
+            else:
+                gap_filter = ""
+                if gap_ids:
+                    gap_filter = f" OR invalidation_id IN ({', '.join('?' * len(gap_ids))})"
+                rows = req.select_rows(
+                    "SELECT invalidation_id, namespace, item_id FROM cache_invalidation "
+                    f"WHERE invalidation_id > ?{gap_filter} ORDER BY invalidation_id",
+                    (last_id, *gap_ids)
+                )
+        except Exception as e:
+            print(f"Invalidation partagée : lecture impossible ({e})", flush=True)
+            with self._lock:
+                self._failures += 1
+            return
+
+        keys = set()
+        namespaces = set()
+        with self._lock:
+            for invalidation_id, namespace, item_id in rows:
+                self._gaps.pop(invalidation_id, None)
+                if self._last_id is not None:
+                    for gap in range(self._last_id + 1, invalidation_id):
+                        self._gaps[gap] = now
+                self._last_id = max(self._last_id or 0, invalidation_id)
+                if namespace is None or invalidation_id in self._own:
+                    self._own.discard(invalidation_id)
+                    continue
+                if item_id is None:
+                    namespaces.add(namespace)
+                else:
+                    keys.add((namespace, item_id))
+            self._applied += len(keys) + len(namespaces)
+
+        if keys:
+            self.cache.invalidate(*keys)
+        for namespace in namespaces:
+            self.cache.invalidate_namespace(namespace)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "refresh": self.refresh,
+                "last_id": self._last_id or 0,
+                "gaps": len(self._gaps),
+                "published": self._published,
+                "applied": self._applied,
+                "failures": self._failures,
+            }
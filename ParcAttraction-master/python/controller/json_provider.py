@@ -0,0 +1,68 @@
+"""
+Sérialisation JSON des réponses
+orjson est utilisé s'il est installé (JSON_ENCODER=json force le module standard) ;
+les deux encodeurs produisent le même JSON : clés triées, dates au format HTTP.
+"""
+
+import decimal
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ENCODER = "orjson" if orjson is not None and os.environ.get("JSON_ENCODER", "orjson") != "json" else "json"
+
+
+def _default(o):
+    # Un Decimal (SUM, AVG de MariaDB) est un nombre pour le client, pas une chaîne
+    if isinstance(o, decimal.Decimal):
+        return float(o)
+    return DefaultJSONProvider.default(o)
+
+
+def dumps_body(obj):
+    """Corps de réponse (octets) identique à celui de FastJSONProvider, sans application Flask
+
+    Sert au cache des contrôleurs, qui sérialise une fois par chargement.
+    """
+    if ENCODER == "orjson":
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, default=_default, sort_keys=True) + "\n").encode()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Fournisseur JSON de Flask : jsonify, app.json.dumps et request.get_json passent par lui"""
+
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs):
+        if ENCODER != "orjson" or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        if ENCODER != "orjson" or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if ENCODER != "orjson":
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self._options() | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(orjson.dumps(obj, default=_default, option=option), mimetype=self.mimetype)
+
+    def _options(self):
+        # Les dates passent par _default pour garder le format de Flask (RFC 822)
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
@@ -0,0 +1,36 @@
+"""
+Pagination par curseur (keyset) sur la clé primaire
+Le curseur est opaque pour le client : il encode le dernier identifiant renvoyé
+"""
+
+import base64
+import json
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def encode_cursor(last_id):
+    raw = json.dumps({"after": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Retourne l'identifiant encodé dans le curseur, ou None s'il est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_id = json.loads(raw)["after"]
+    except (ValueError, TypeError, KeyError):
+        return None
+    if type(last_id) is not int:
+        return None
+    return last_id
+
+
+def build_page(rows, limit, key):
+    """Construit la page à partir de `limit + 1` lignes : la ligne en trop signale une page suivante"""
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and items:
+        next_cursor = encode_cursor(items[-1][key])
+    return {"items": items, "next_cursor": next_cursor}
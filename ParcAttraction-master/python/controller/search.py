@@ -0,0 +1,60 @@
+"""
+Recherche plein texte dans les attractions visibles et leurs critiques
+Appuyée sur les index FULLTEXT de MariaDB (voir init.py) : pas de parcours LIKE '%x%'.
+La collation utf8mb4 ignore casse et accents : "manege" trouve "Manège".
+"""
+
+import re
+
+import request.request as req
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Longueur minimale d'un mot indexé par InnoDB (innodb_ft_min_token_size)
+MIN_WORD_LENGTH = 3
+MAX_WORDS = 10
+
+# Opérateurs du mode booléen, retirés de la saisie de l'utilisateur
+_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+
+# Le nom pèse double dans le classement des attractions
+_ATTRACTION_SEARCH = (
+    "SELECT attraction_id, nom, description, difficulte, "
+    "2 * MATCH(nom) AGAINST (? IN BOOLEAN MODE) + MATCH(nom, description) AGAINST (? IN BOOLEAN MODE) AS score "
+    "FROM attraction "
+    "WHERE visible = 1 AND MATCH(nom, description) AGAINST (? IN BOOLEAN MODE) "
+    "ORDER BY score DESC, attraction_id LIMIT ?"
+)
+
+_CRITIQUE_SEARCH = (
+    "SELECT c.critique_id, c.attraction_id, a.nom AS attraction_nom, c.note, c.commentaire, c.created_at, "
+    "MATCH(c.commentaire) AGAINST (? IN BOOLEAN MODE) AS score "
+    "FROM critique c JOIN attraction a ON a.attraction_id = c.attraction_id "
+    "WHERE a.visible = 1 AND MATCH(c.commentaire) AGAINST (? IN BOOLEAN MODE) "
+    "ORDER BY score DESC, c.critique_id DESC LIMIT ?"
+)
+
+
+def boolean_query(text):
+    """Saisie libre -> requête du mode booléen : chaque mot est exigé, en préfixe
+
+    "montagne rus" donne "+montagne* +rus*". Les mots trop courts pour l'index
+    sont ignorés ; renvoie None s'il ne reste rien à chercher.
+    """
+    words = [word for word in _OPERATORS.sub(" ", text).split() if len(word) >= MIN_WORD_LENGTH]
+    if not words:
+        return None
+    return " ".join(f"+{word}*" for word in words[:MAX_WORDS])
+
+
+def search(text, limit=DEFAULT_LIMIT):
+    """Attractions et critiques correspondant à `text`, de la plus à la moins pertinente"""
+    query = boolean_query(text)
+    if query is None:
+        return None
+
+    attractions = req.select_from_db(_ATTRACTION_SEARCH, (query, query, query, limit))
+    critiques = req.select_from_db(_CRITIQUE_SEARCH, (query, query, limit))
+    for row in attractions + critiques:
+        row['score'] = round(float(row['score']), 4)
+    return {"query": text, "attractions": attractions, "critiques": critiques}
@@ -0,0 +1,107 @@
+"""
+Instantanés JSON des listes publiques, servis directement par nginx
+Après une écriture, les fichiers sont régénérés (version brute et .gz) puis remplacés
+atomiquement : une requête ne voit jamais un fichier à moitié écrit.
+"""
+
+import fcntl
+import gzip
+import os
+import threading
+import time
+
+
+class SnapshotPublisher:
+    """Régénère les fichiers `builders` (nom de fichier -> fonction renvoyant le corps)
+
+    Le corps est celui que l'API envoie pour la même liste (entrée du cache) : le
+    client reçoit les mêmes octets, que la liste soit servie par nginx ou par Flask.
+
+    Les demandes sont regroupées : une rafale d'écritures ne donne qu'une régénération
+    toutes les `delay` secondes au plus. Une écriture arrivée pendant une régénération
+    en déclenche une autre ensuite.
+    """
+
+    def __init__(self, directory, builders, delay=1.0):
+        self.directory = directory
+        self.builders = builders
+        self.delay = delay
+
+        self._lock = threading.Lock()
+        self._timer = None
+        self._running = False
+        self._dirty = False
+
+        self._scheduled = 0
+        self._published = 0
+        self._failures = 0
+        self._last_duration = 0.0
+
+    def schedule(self):
+        """Demande une régénération, effectuée au plus tard dans `delay` secondes"""
+        with self._lock:
+            self._scheduled += 1
+            if self._running:
+                self._dirty = True
+                return
+            if self._timer is None:
+                self._start_timer()
+
+    def publish(self):
+        """Régénère tous les fichiers maintenant"""
+        os.makedirs(self.directory, exist_ok=True)
+        start = time.perf_counter()
+        # Verrou partagé entre les workers Gunicorn : deux régénérations concurrentes
+        # pourraient sinon publier la plus ancienne en dernier
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            for name, builder in self.builders.items():
+                body = builder()
+                _write_atomic(os.path.join(self.directory, name), body)
+                _write_atomic(os.path.join(self.directory, name + ".gz"), gzip.compress(body, 6))
+        with self._lock:
+            self._published += 1
+            self._last_duration = time.perf_counter() - start
+
+    def stats(self):
+        with self._lock:
+            return {
+                "scheduled": self._scheduled,
+                "published": self._published,
+                "failures": self._failures,
+                "pending": self._timer is not None or self._dirty,
+                "last_duration_ms": round(self._last_duration * 1000, 3),
+            }
+
+    def _start_timer(self):
+        # Appelé sous verrou
+        self._timer = threading.Timer(self.delay, self._run)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _run(self):
+        with self._lock:
+            self._timer = None
+            self._running = True
+            self._dirty = False
+        try:
+            self.publish()
+        except Exception as e:
+            # Les fichiers précédents restent en place ; la prochaine écriture réessaiera
+            print(f"Instantanés : régénération impossible ({e})", flush=True)
+            with self._lock:
+                self._failures += 1
+        finally:
+            with self._lock:
+                self._running = False
+                if self._dirty and self._timer is None:
+                    self._dirty = False
+                    self._start_timer()
+
+
+def _write_atomic(path, data):
+    """Écrit dans un fichier temporaire du même dossier puis le renomme"""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
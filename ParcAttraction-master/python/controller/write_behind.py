@@ -0,0 +1,140 @@
+"""
+Tampon d'écriture différée (write-behind)
+Les éléments sont acceptés en mémoire puis écrits par lots par un thread de fond
+"""
+
+import os
+import queue
+import threading
+import time
+
+
+class BufferFull(Exception):
+    """Levée quand le tampon est plein : le client doit réessayer plus tard"""
+
+
+class WriteBehindBuffer:
+    """File bornée vidée par lots, dès `batch_size` éléments ou toutes les `interval` secondes
+
+    Un lot en échec est réessayé avec attente si `is_transient(erreur)` (base
+    indisponible) ; sinon il est coupé en deux jusqu'à isoler les éléments fautifs,
+    seuls écartés : les autres éléments du lot sont écrits.
+    """
+
+    def __init__(self, flush, max_size=10000, batch_size=500, interval=1.0, retries=3, is_transient=None):
+        self._flush = flush
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retries = retries
+        self.is_transient = is_transient or (lambda e: False)
+
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+        self._accepted = 0
+        self._rejected = 0
+        self._flushed = 0
+        self._batches = 0
+        self._dropped = 0
+
+    def submit(self, item):
+        """Met `item` en attente d'écriture, lève BufferFull si la file est pleine"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise BufferFull()
+        with self._lock:
+            self._accepted += 1
+
+    def close(self, timeout=10.0):
+        """Arrête le thread de fond après avoir écrit tout ce qui est en attente"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self._queue.qsize(),
+                "max_size": self.max_size,
+                "batch_size": self.batch_size,
+                "interval": self.interval,
+                "accepted": self._accepted,
+                "rejected": self._rejected,
+                "flushed": self._flushed,
+                "batches": self._batches,
+                "dropped": self._dropped,
+            }
+
+    def _ensure_started(self):
+        # Le thread est démarré au premier usage, dans le processus qui l'utilise
+        # (un thread ne survit pas à un fork)
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self):
+        """Attend le premier élément puis complète le lot jusqu'à la taille ou au délai"""
+        try:
+            batch = [self._queue.get(timeout=self.interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                remaining = 0
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        for attempt in range(1, self.retries + 1):
+            try:
+                self._flush(batch)
+                with self._lock:
+                    self._flushed += len(batch)
+                    self._batches += 1
+                return
+            except Exception as e:
+                if not self.is_transient(e):
+                    self._split(batch, e)
+                    return
+                print(f"Write-behind : échec de l'écriture de {len(batch)} éléments (tentative {attempt}/{self.retries}) : {e}", flush=True)
+                if attempt < self.retries:
+                    time.sleep(min(2 ** attempt, 10))
+        with self._lock:
+            self._dropped += len(batch)
+
+    def _split(self, batch, error):
+        """Écarte un élément refusé, ou réessaie chaque moitié du lot séparément"""
+        if len(batch) == 1:
+            print(f"Write-behind : élément écarté ({error}) : {batch[0]!r:.200}", flush=True)
+            with self._lock:
+                self._dropped += 1
+            return
+        middle = len(batch) // 2
+        self._write(batch[:middle])
+        self._write(batch[middle:])
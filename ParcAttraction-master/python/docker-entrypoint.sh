@@ -70,11 +70,23 @@ if [ "$TABLE_COUNT" = "0" ] || [ -z "$TABLE_COUNT" ]; then
     fi
 else
     echo "✅ Base de données déjà initialisée ($TABLE_COUNT tables)"
+    # Base créée par une version précédente : ajout des tables et index manquants
+    # (processus à part, sans fichiers de métriques ni instantanés)
+    echo "🔧 Mise à niveau du schéma..."
+    env -u METRICS_MULTIPROC_DIR -u SNAPSHOT_DIR python3 migrate.py
 fi
 
 echo ""
-echo "🚀 Démarrage du serveur Flask..."
-echo ""
 
-# Démarrer Flask
-exec python3 -m flask --debug run --host=0.0.0.0
\ No newline at end of file
+# SERVER_MODE=debug : serveur de développement Flask (rechargement automatique)
+# sinon : Gunicorn multi-workers, configuré par gunicorn.conf.py
+if [ "${SERVER_MODE:-production}" = "debug" ]; then
+    echo "🚀 Démarrage du serveur Flask (mode debug)..."
+    echo ""
+    # Un seul processus : pas besoin des fichiers de métriques partagés
+    exec env -u METRICS_MULTIPROC_DIR python3 -m flask --debug run --host=0.0.0.0
+fi
+
+echo "🚀 Démarrage de Gunicorn (mode production)..."
+echo ""
+exec gunicorn --config gunicorn.conf.py app:app
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+Configuration Gunicorn (mode production)
+Chaque valeur peut être surchargée par une variable d'environnement
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Pre-fork : un processus par worker, plusieurs threads par worker
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# Recyclage périodique des workers pour borner la mémoire
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+# L'application est importée dans chaque worker : pool, cache et tampon
+# d'écriture sont propres au worker
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    """Repart de métriques vides : les fichiers d'un lancement précédent ne comptent plus"""
+    import metrics.metrics as metrics
+    if metrics.MULTIPROC_DIR:
+        metrics.clear_multiprocess_dir()
+
+
+def worker_exit(server, worker):
+    """Écrit les critiques en attente avant l'arrêt du worker"""
+    import controller.attraction as attraction
+    if attraction.critique_buffer is not None:
+        attraction.critique_buffer.close()
+    import request.request as req
+    req.close_pool()
+    # Dernières métriques du worker, archivées ensuite par le maître (child_exit)
+    import metrics.metrics as metrics
+    if metrics.MULTIPROC_DIR:
+        metrics.write_process_file()
+
+
+def child_exit(server, worker):
+    """Garde les compteurs du worker arrêté dans l'archive des métriques"""
+    import metrics.metrics as metrics
+    if metrics.MULTIPROC_DIR:
+        metrics.archive_process(worker.pid)
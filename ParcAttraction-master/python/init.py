@@ -4,7 +4,10 @@ Script d'initialisation de la base de données
 Crée les tables et insère les données de test
 """
 
+import argparse
+import datetime
 import mariadb
+import random
 import sys
 import time
 
@@ -31,8 +34,123 @@ def wait_for_db(max_attempts=30):
     print("❌ Impossible de se connecter à la base de données")
     return False
 
-def init_database():
-    """Initialise la base de données avec les tables et données"""
+# Vocabulaire des données synthétiques
+NOMS_ATTRACTION = ["Dragon", "Tornade", "Vertige", "Cyclone", "Galaxie", "Pirate", "Jungle", "Volcan",
+                   "Comète", "Tempête", "Odyssée", "Titan", "Phénix", "Mirage", "Kraken", "Zéphyr"]
+TYPES_ATTRACTION = ["Montagne russe", "Chute libre", "Manège", "Parcours scénique", "Bateau", "Grande roue"]
+NOMS = ["Dupont", "Martin", "Bernard", "Petit", "Durand", "Leroy", "Moreau", "Simon", "Laurent", "Lefebvre"]
+PRENOMS = ["Marie", "Jean", "Sophie", "Lucas", "Emma", "Pierre", "Léa", "Hugo", "Chloé", "Louis"]
+COMMENTAIRES = [
+    "Sensations garanties, on a refait un tour!",
+    "Trop d'attente pour une attraction aussi courte.",
+    "Parfait pour les enfants.",
+    "Un classique du parc, toujours aussi efficace.",
+    "Décevant, l'attraction était à moitié fermée.",
+    "Les décors sont magnifiques.",
+    "J'ai eu un peu peur mais j'ai adoré!",
+    "",
+]
+
+def critique_counts(nb_attractions, total, skew, rng):
+    """Répartit `total` critiques sur les attractions selon une loi de Zipf d'exposant `skew`
+
+    Le rang de popularité est tiré au hasard : la popularité ne suit pas l'identifiant.
+    """
+    weights = [1 / (rank ** skew) for rank in range(1, nb_attractions + 1)]
+    rng.shuffle(weights)
+    scale = total / sum(weights)
+    return [round(weight * scale) for weight in weights]
+
+# Date de référence des critiques synthétiques : fixe, pour que `seed` suffise à reproduire les données
+DEFAULT_REFERENCE_DATE = datetime.datetime(2025, 1, 1)
+
+def seed_synthetic_data(conn, cur, nb_attractions, critiques_per_attraction, visible_ratio,
+                        skew=1.0, seed=42, batch_size=10000, reference_date=DEFAULT_REFERENCE_DATE):
+    """Ajoute des attractions et des critiques synthétiques, reproductibles à partir de `seed`
+
+    Les dates des critiques sont tirées dans l'année qui précède `reference_date`.
+
+    Insertion par executemany en lots de `batch_size` lignes, une transaction par lot,
+    contrôles des clés étrangères et d'unicité désactivés le temps du chargement.
+    """
+    rng = random.Random(seed)
+    start = time.monotonic()
+    cur.execute("SET FOREIGN_KEY_CHECKS = 0")
+    cur.execute("SET UNIQUE_CHECKS = 0")
+    
+    print(f"\n🎢 Génération de {nb_attractions} attractions synthétiques...")
+    cur.execute("SELECT COALESCE(MAX(attraction_id), 0) FROM attraction")
+    last_id = cur.fetchone()[0]
+    
+    def attractions():
+        for i in range(nb_attractions):
+            nom = f"{rng.choice(NOMS_ATTRACTION)} {rng.choice(NOMS_ATTRACTION)} {i + 1}"
+            description = f"{rng.choice(TYPES_ATTRACTION)} générée pour les tests de charge."
+            yield (nom, description, rng.randint(1, 5), 1 if rng.random() < visible_ratio else 0)
+    
+    insert_batches(conn, cur, """
+        INSERT INTO attraction (nom, description, difficulte, visible)
+        VALUES (?, ?, ?, ?)
+    """, attractions(), batch_size)
+    
+    cur.execute("SELECT attraction_id FROM attraction WHERE attraction_id > ? ORDER BY attraction_id", (last_id,))
+    attraction_ids = [row[0] for row in cur.fetchall()]
+    
+    total = nb_attractions * critiques_per_attraction
+    counts = critique_counts(len(attraction_ids), total, skew, rng)
+    print(f"💬 Génération d'environ {total} critiques (la plus critiquée: {max(counts, default=0)})...")
+    
+    def critiques():
+        for attraction_id, count in zip(attraction_ids, counts):
+            # Chaque attraction a sa propre tendance de notes
+            qualite = rng.uniform(1.5, 4.8)
+            for _ in range(count):
+                note = min(5, max(1, round(rng.gauss(qualite, 1.0))))
+                anonyme = rng.random() < 0.3
+                yield (
+                    attraction_id,
+                    "Anonyme" if anonyme else rng.choice(NOMS),
+                    "" if anonyme else rng.choice(PRENOMS),
+                    note,
+                    rng.choice(COMMENTAIRES),
+                    1 if anonyme else 0,
+                    reference_date - datetime.timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+                )
+    
+    inserted = insert_batches(conn, cur, """
+        INSERT INTO critique (attraction_id, nom, prenom, note, commentaire, est_anonyme, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, critiques(), batch_size)
+    
+    cur.execute("SET UNIQUE_CHECKS = 1")
+    cur.execute("SET FOREIGN_KEY_CHECKS = 1")
+    duration = time.monotonic() - start
+    print(f"✅ {len(attraction_ids)} attractions et {inserted} critiques générées en {duration:.1f}s "
+          f"({(len(attraction_ids) + inserted) / max(duration, 0.001):.0f} lignes/s)")
+
+def insert_batches(conn, cur, requete, rows, batch_size):
+    """executemany par lots de `batch_size`, validés lot par lot ; renvoie le nombre de lignes"""
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cur.executemany(requete, batch)
+            conn.commit()
+            count += len(batch)
+            batch = []
+            print(f"   ... {count} lignes", flush=True)
+    if batch:
+        cur.executemany(requete, batch)
+        conn.commit()
+        count += len(batch)
+    return count
+
+def init_database(args=None):
+    """Initialise la base de données avec les tables et données
+
+    Avec `args.attractions`, des données synthétiques sont ajoutées aux données de test.
+    """
     
     if not wait_for_db():
         sys.exit(1)
@@ -52,6 +170,10 @@ def init_database():
         
         # Suppression des tables existantes
         print("\n🗑️  Suppression des tables existantes...")
+        cur.execute("DROP TABLE IF EXISTS cache_invalidation")
+        cur.execute("DROP TABLE IF EXISTS tombstone")
+        cur.execute("DROP TABLE IF EXISTS revoked_token")
+        cur.execute("DROP TABLE IF EXISTS attraction_stats")
         cur.execute("DROP TABLE IF EXISTS critique")
         cur.execute("DROP TABLE IF EXISTS attraction")
         cur.execute("DROP TABLE IF EXISTS users")
@@ -82,7 +204,9 @@ def init_database():
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                 INDEX idx_visible (visible),
-                INDEX idx_difficulte (difficulte)
+                INDEX idx_difficulte (difficulte),
+                FULLTEXT INDEX ft_attraction_nom (nom),
+                FULLTEXT INDEX ft_attraction_texte (nom, description)
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
         """)
         print("✅ Table 'attraction' créée")
@@ -106,11 +230,72 @@ def init_database():
                     ON UPDATE CASCADE,
                 INDEX idx_attraction_id (attraction_id),
                 INDEX idx_note (note),
-                INDEX idx_created_at (created_at)
+                INDEX idx_created_at (created_at),
+                FULLTEXT INDEX ft_critique_commentaire (commentaire)
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
         """)
         print("✅ Table 'critique' créée")
         
+        # Création de la table des statistiques de notes
+        print("\n📋 Création de la table 'attraction_stats'...")
+        cur.execute("""
+            CREATE TABLE attraction_stats (
+                attraction_id INT PRIMARY KEY,
+                nb_critiques INT NOT NULL DEFAULT 0,
+                somme_notes INT NOT NULL DEFAULT 0,
+                nb_note_1 INT NOT NULL DEFAULT 0,
+                nb_note_2 INT NOT NULL DEFAULT 0,
+                nb_note_3 INT NOT NULL DEFAULT 0,
+                nb_note_4 INT NOT NULL DEFAULT 0,
+                nb_note_5 INT NOT NULL DEFAULT 0,
+                derniere_critique TIMESTAMP NULL,
+                CONSTRAINT fk_stats_attraction 
+                    FOREIGN KEY (attraction_id) 
+                    REFERENCES attraction(attraction_id) 
+                    ON DELETE CASCADE 
+                    ON UPDATE CASCADE
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        print("✅ Table 'attraction_stats' créée")
+        
+        # Création de la table des tokens révoqués (déconnexion)
+        print("\n📋 Création de la table 'revoked_token'...")
+        cur.execute("""
+            CREATE TABLE revoked_token (
+                revoked_id INT AUTO_INCREMENT PRIMARY KEY,
+                digest CHAR(64) NOT NULL UNIQUE,
+                expires_at TIMESTAMP NOT NULL,
+                INDEX idx_expires_at (expires_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        print("✅ Table 'revoked_token' créée")
+        
+        # Création de la table des suppressions (synchronisation différentielle)
+        print("\n📋 Création de la table 'tombstone'...")
+        cur.execute("""
+            CREATE TABLE tombstone (
+                tombstone_id INT AUTO_INCREMENT PRIMARY KEY,
+                entity VARCHAR(20) NOT NULL,
+                entity_id INT NOT NULL,
+                deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_deleted_at (deleted_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        print("✅ Table 'tombstone' créée")
+        
+        # Création de la table des invalidations du cache (partagées entre workers)
+        print("\n📋 Création de la table 'cache_invalidation'...")
+        cur.execute("""
+            CREATE TABLE cache_invalidation (
+                invalidation_id INT AUTO_INCREMENT PRIMARY KEY,
+                namespace VARCHAR(30) NOT NULL,
+                item_id INT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_created_at (created_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        print("✅ Table 'cache_invalidation' créée")
+        
         # Insertion de l'utilisateur admin
         print("\n👤 Insertion de l'utilisateur administrateur...")
         cur.execute("""
@@ -161,6 +346,22 @@ def init_database():
         
         print(f"✅ {len(critiques)} critiques insérées")
         
+        if args is not None and args.attractions:
+            seed_synthetic_data(conn, cur, args.attractions, args.critiques, args.visible_ratio,
+                                args.skew, args.seed, args.batch_size, args.reference_date)
+        
+        # Calcul des statistiques de notes
+        print("\n📈 Calcul des statistiques de notes...")
+        cur.execute("""
+            INSERT INTO attraction_stats (attraction_id, nb_critiques, somme_notes,
+                nb_note_1, nb_note_2, nb_note_3, nb_note_4, nb_note_5, derniere_critique)
+            SELECT attraction_id, COUNT(*), SUM(note),
+                SUM(note = 1), SUM(note = 2), SUM(note = 3), SUM(note = 4), SUM(note = 5),
+                MAX(created_at)
+            FROM critique GROUP BY attraction_id
+        """)
+        print("✅ Statistiques calculées")
+        
         # Commit
         conn.commit()
         print("\n✅ Toutes les modifications ont été enregistrées!")
@@ -209,14 +410,33 @@ def init_database():
         print(f"\n❌ Erreur: {e}")
         return False
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Initialisation de la base 'parc'")
+    parser.add_argument("--attractions", type=int, default=0,
+                        help="Nombre d'attractions synthétiques à générer (0: données de test seules)")
+    parser.add_argument("--critiques", type=int, default=20,
+                        help="Nombre moyen de critiques par attraction synthétique")
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="Exposant de Zipf de la répartition des critiques (0: uniforme)")
+    parser.add_argument("--visible-ratio", type=float, default=0.8,
+                        help="Proportion d'attractions synthétiques visibles")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du générateur aléatoire")
+    parser.add_argument("--batch-size", type=int, default=10000,
+                        help="Nombre de lignes par executemany et par transaction")
+    parser.add_argument("--reference-date", type=datetime.datetime.fromisoformat,
+                        default=DEFAULT_REFERENCE_DATE,
+                        help="Les critiques synthétiques sont datées de l'année qui précède (AAAA-MM-JJ)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
     print("""
 ╔═══════════════════════════════════════════════════════════╗
 ║     SCRIPT D'INITIALISATION - PARC D'ATTRACTION           ║
 ║                                                           ║
 ║  Ce script va:                                            ║
 ║  1. Supprimer toutes les tables existantes                ║
-║  2. Créer les tables (users, attraction, critique)        ║
+║  2. Créer les tables (users, attraction, critique, stats) ║
 ║  3. Insérer les données de test                           ║
 ║                                                           ║
 ║  ⚠️  ATTENTION: Toutes les données existantes seront      ║
@@ -224,7 +444,7 @@ if __name__ == "__main__":
 ╚═══════════════════════════════════════════════════════════╝
     """)
     
-    success = init_database()
+    success = init_database(args)
     
     if success:
         sys.exit(0)
@@ -0,0 +1,307 @@
+"""
+Métriques de l'API au format texte Prometheus
+Latence par route et code HTTP, temps passé en base, requêtes et lignes par requête HTTP
+
+Sous Gunicorn chaque worker a ses histogrammes. Avec METRICS_MULTIPROC_DIR, chaque
+worker y écrit régulièrement les siens (<pid>.json) et /metrics les additionne :
+une collecte donne le total du service quel que soit le worker qui la sert.
+"""
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+
+# Bornes des histogrammes (secondes pour les durées, unités pour les compteurs)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 1000, 10000, 100000)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _RequestStats:
+    """Compteurs de base de données de la requête HTTP en cours"""
+    __slots__ = ("db_time", "queries", "rows")
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+        self.rows = 0
+
+
+_lock = threading.Lock()
+_histograms = {}
+_current = contextvars.ContextVar("metrics_request", default=None)
+
+MULTIPROC_DIR = os.environ.get("METRICS_MULTIPROC_DIR")
+SYNC_INTERVAL = float(os.environ.get("METRICS_SYNC_INTERVAL", 1))
+# Histogrammes des workers arrêtés, pour que les compteurs ne redescendent jamais
+ARCHIVE_FILE = "archive.json"
+
+_gauges = None
+_writer_pid = None
+
+
+def _observe(name, labels, value, buckets):
+    with _lock:
+        histogram = _histograms.get((name, labels))
+        if histogram is None:
+            histogram = _histograms[(name, labels)] = Histogram(buckets)
+        histogram.observe(value)
+
+
+def start_request():
+    """Ouvre les compteurs de base de données de la requête HTTP courante"""
+    _current.set(_RequestStats())
+
+
+def end_request(route, method, status, duration):
+    """Enregistre la latence de la requête et ce qu'elle a coûté en base"""
+    labels = (("route", route), ("method", method), ("status", str(status)))
+    _observe("parc_http_request_duration_seconds", labels, duration, LATENCY_BUCKETS)
+
+    stats = _current.get()
+    if stats is None:
+        return
+    _current.set(None)
+    route_labels = (("route", route),)
+    _observe("parc_http_request_db_seconds", route_labels, stats.db_time, LATENCY_BUCKETS)
+    _observe("parc_http_request_db_queries", route_labels, stats.queries, COUNT_BUCKETS)
+    _observe("parc_http_request_db_rows", route_labels, stats.rows, COUNT_BUCKETS)
+
+
+def record_query(operation, duration):
+    """Enregistre l'exécution d'une requête SQL (`operation` : select, insert...)"""
+    _observe("parc_db_query_duration_seconds", (("operation", operation),), duration, LATENCY_BUCKETS)
+    stats = _current.get()
+    if stats is not None:
+        stats.db_time += duration
+        stats.queries += 1
+
+
+def record_fetch(duration, rows):
+    """Enregistre la lecture de `rows` lignes d'un résultat"""
+    stats = _current.get()
+    if stats is not None:
+        stats.db_time += duration
+        stats.rows += rows
+
+
+def register_gauges(gauges):
+    """Déclare la fonction qui renvoie les jauges du processus
+
+    Chaque élément est un couple (préfixe, dictionnaire) ou un triplet (préfixe,
+    dictionnaire, clés cumulatives) : ces clés sont exportées comme compteurs.
+
+    En mode multiprocessus, démarre l'écriture périodique des métriques de ce worker.
+    """
+    global _gauges, _writer_pid
+    _gauges = gauges
+    if MULTIPROC_DIR and _writer_pid != os.getpid():
+        _writer_pid = os.getpid()
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+        thread = threading.Thread(target=_write_loop, name="metrics-writer", daemon=True)
+        thread.start()
+
+
+def _snapshot():
+    with _lock:
+        return [(name, labels, h.buckets, list(h.counts), h.sum, h.count)
+                for (name, labels), h in _histograms.items()]
+
+
+def _write_loop():
+    while True:
+        time.sleep(SYNC_INTERVAL)
+        try:
+            write_process_file()
+        except Exception as e:
+            print(f"Métriques : écriture impossible ({e})", flush=True)
+
+
+def write_process_file():
+    """Écrit les histogrammes et les jauges de ce processus dans MULTIPROC_DIR/<pid>.json"""
+    data = {
+        "histograms": [[name, labels, buckets, counts, total, count]
+                       for name, labels, buckets, counts, total, count in _snapshot()],
+        "gauges": _gauges() if _gauges is not None else [],
+    }
+    _write_json(os.path.join(MULTIPROC_DIR, f"{os.getpid()}.json"), data)
+
+
+def archive_process(pid):
+    """Ajoute les histogrammes d'un worker arrêté à l'archive puis supprime son fichier
+
+    Appelé par le maître Gunicorn : l'archive est écrite avant la suppression, et
+    liste les pid archivés pour qu'une lecture concurrente ne compte rien deux fois.
+    """
+    path = os.path.join(MULTIPROC_DIR, f"{pid}.json")
+    process = _read_json(path)
+    if process is None:
+        return
+    archive = _read_json(os.path.join(MULTIPROC_DIR, ARCHIVE_FILE)) or {"pids": [], "histograms": []}
+    merged = {}
+    _merge(merged, archive["histograms"])
+    _merge(merged, process["histograms"])
+    archive = {
+        "pids": archive["pids"] + [pid],
+        "histograms": [[name, labels, buckets, counts, total, count]
+                       for (name, labels), (buckets, counts, total, count) in merged.items()],
+    }
+    _write_json(os.path.join(MULTIPROC_DIR, ARCHIVE_FILE), archive)
+    os.remove(path)
+
+
+def clear_multiprocess_dir():
+    """Vide MULTIPROC_DIR au démarrage du maître Gunicorn"""
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    for name in os.listdir(MULTIPROC_DIR):
+        if name.endswith(".json"):
+            os.remove(os.path.join(MULTIPROC_DIR, name))
+
+
+def _merge(merged, histograms):
+    """Additionne des histogrammes [nom, labels, bornes, compteurs, somme, nombre] dans `merged`"""
+    for name, labels, buckets, counts, total, count in histograms:
+        key = (name, tuple(tuple(label) for label in labels))
+        current = merged.get(key)
+        if current is None:
+            merged[key] = (tuple(buckets), list(counts), total, count)
+        else:
+            merged[key] = (current[0], [a + b for a, b in zip(current[1], counts)],
+                           current[2] + total, current[3] + count)
+
+
+def _multiprocess_data():
+    """Histogrammes additionnés de tous les workers et jauges de chaque worker vivant"""
+    write_process_file()
+    processes = {}
+    for name in os.listdir(MULTIPROC_DIR):
+        if name.endswith(".json") and name != ARCHIVE_FILE:
+            data = _read_json(os.path.join(MULTIPROC_DIR, name))
+            if data is not None:
+                processes[int(name[:-5])] = data
+    # Lue après les fichiers des workers : un worker absent de la liste est forcément archivé
+    archive = _read_json(os.path.join(MULTIPROC_DIR, ARCHIVE_FILE)) or {"pids": [], "histograms": []}
+    archived = set(archive["pids"])
+
+    merged = {}
+    _merge(merged, archive["histograms"])
+    gauges = []
+    for pid, data in sorted(processes.items()):
+        if pid in archived:
+            continue
+        _merge(merged, data["histograms"])
+        worker = (("worker", str(pid)),)
+        gauges.extend((prefix, values, tuple(counters[0]) if counters else (), worker)
+                      for prefix, values, *counters in data["gauges"])
+
+    snapshot = [(name, labels, buckets, counts, total, count)
+                for (name, labels), (buckets, counts, total, count) in merged.items()]
+    return snapshot, gauges
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def render(gauges=None):
+    """Texte d'exposition Prometheus
+
+    `gauges` : couples (préfixe, dictionnaire) ajoutés comme jauges, par exemple
+    ("parc_pool", pool.stats()) donne parc_pool_in_use, parc_pool_idle...
+    Un triplet (préfixe, dictionnaire, clés) exporte ces clés, cumulatives, comme
+    compteurs suffixés _total : ("parc_pool", stats, ("borrows",)) donne
+    parc_pool_borrows_total. Par défaut, celles de register_gauges. En mode
+    multiprocessus, les valeurs de chaque worker sont étiquetées par son pid
+    (worker="...") : un compteur repart de zéro au remplacement d'un worker.
+    """
+    if MULTIPROC_DIR and _gauges is not None:
+        snapshot, labelled_gauges = _multiprocess_data()
+    else:
+        snapshot = _snapshot()
+        if gauges is None:
+            gauges = _gauges() if _gauges is not None else []
+        labelled_gauges = [(prefix, values, tuple(counters[0]) if counters else (), ())
+                           for prefix, values, *counters in gauges]
+
+    lines = []
+    declared = set()
+    for name, labels, buckets, counts, total, count in sorted(snapshot, key=lambda s: (s[0], s[1])):
+        if name not in declared:
+            lines.append(f"# TYPE {name} histogram")
+            declared.add(name)
+        cumulative = 0
+        for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_labels(labels + (('le', _format(bound)),))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {_format(total)}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+
+    # Les échantillons d'une même métrique doivent se suivre (un par worker)
+    samples = {}
+    for prefix, values, counters, labels in labelled_gauges:
+        for key, value in sorted((values or {}).items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key in counters:
+                metric = (_counter_name(f"{prefix}_{key}"), "counter")
+            else:
+                metric = (f"{prefix}_{key}", "gauge")
+            samples.setdefault(metric, []).append((labels, value))
+    for (name, kind), values in samples.items():
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in values:
+            lines.append(f"{name}{_labels(labels)} {_format(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _counter_name(name):
+    """Nom Prometheus d'un compteur : _total à la fin (wait_time_total_ms -> wait_time_ms_total)"""
+    return name.replace("_total", "") + "_total"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{key}="{_escape(value)}"' for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Mise à niveau d'une base déjà initialisée
+Ajoute, sans rien supprimer, les tables et index créés par init.py depuis la
+première version : peut être relancé à chaque démarrage.
+"""
+
+import sys
+
+import mariadb
+
+import request.request as req
+
+# Tables ajoutées depuis la première version, dans l'ordre des clés étrangères
+TABLES = {
+    "attraction_stats": """
+        CREATE TABLE IF NOT EXISTS attraction_stats (
+            attraction_id INT PRIMARY KEY,
+            nb_critiques INT NOT NULL DEFAULT 0,
+            somme_notes INT NOT NULL DEFAULT 0,
+            nb_note_1 INT NOT NULL DEFAULT 0,
+            nb_note_2 INT NOT NULL DEFAULT 0,
+            nb_note_3 INT NOT NULL DEFAULT 0,
+            nb_note_4 INT NOT NULL DEFAULT 0,
+            nb_note_5 INT NOT NULL DEFAULT 0,
+            derniere_critique TIMESTAMP NULL,
+            CONSTRAINT fk_stats_attraction
+                FOREIGN KEY (attraction_id)
+                REFERENCES attraction(attraction_id)
+                ON DELETE CASCADE
+                ON UPDATE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    "revoked_token": """
+        CREATE TABLE IF NOT EXISTS revoked_token (
+            revoked_id INT AUTO_INCREMENT PRIMARY KEY,
+            digest CHAR(64) NOT NULL UNIQUE,
+            expires_at TIMESTAMP NOT NULL,
+            INDEX idx_expires_at (expires_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    "tombstone": """
+        CREATE TABLE IF NOT EXISTS tombstone (
+            tombstone_id INT AUTO_INCREMENT PRIMARY KEY,
+            entity VARCHAR(20) NOT NULL,
+            entity_id INT NOT NULL,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_deleted_at (deleted_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    "cache_invalidation": """
+        CREATE TABLE IF NOT EXISTS cache_invalidation (
+            invalidation_id INT AUTO_INCREMENT PRIMARY KEY,
+            namespace VARCHAR(30) NOT NULL,
+            item_id INT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_created_at (created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+}
+
+# Index ajoutés aux tables existantes : (table, nom, définition)
+INDEXES = [
+    ("attraction", "ft_attraction_nom", "FULLTEXT INDEX ft_attraction_nom (nom)"),
+    ("attraction", "ft_attraction_texte", "FULLTEXT INDEX ft_attraction_texte (nom, description)"),
+    ("critique", "ft_critique_commentaire", "FULLTEXT INDEX ft_critique_commentaire (commentaire)"),
+]
+
+def index_exists(cur, table, name):
+    cur.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+        "WHERE table_schema = DATABASE() AND table_name = ? AND index_name = ?",
+        (table, name)
+    )
+    return cur.fetchone()[0] > 0
+
+def migrate():
+    """Crée les tables et index manquants puis remplit attraction_stats si besoin"""
+    with req.get_db_connection() as (cur, conn):
+        for name, create in TABLES.items():
+            cur.execute(create)
+            print(f"✅ Table '{name}' présente", flush=True)
+
+        for table, name, definition in INDEXES:
+            if index_exists(cur, table, name):
+                continue
+            print(f"📋 Ajout de l'index '{name}' sur '{table}'...", flush=True)
+            cur.execute(f"ALTER TABLE {table} ADD {definition}")
+
+        # Table vide alors qu'il existe des critiques : elle vient d'être créée
+        # (ou un démarrage précédent s'est arrêté avant de la remplir)
+        cur.execute(
+            "SELECT EXISTS (SELECT 1 FROM critique) AND NOT EXISTS (SELECT 1 FROM attraction_stats)"
+        )
+        backfill = bool(cur.fetchone()[0])
+        conn.commit()
+
+    if backfill:
+        # Import tardif : le module crée le cache et lit sa configuration au chargement
+        import controller.attraction as attraction
+        print("📊 Calcul de attraction_stats...", flush=True)
+        nb_attractions = attraction.rebuild_attraction_stats()
+        print(f"✅ Statistiques calculées pour {nb_attractions} attractions", flush=True)
+
+if __name__ == "__main__":
+    try:
+        migrate()
+    except mariadb.Error as e:
+        print(f"❌ Erreur MariaDB pendant la mise à niveau: {e}", flush=True)
+        sys.exit(1)
+    req.close_pool()
@@ -0,0 +1,205 @@
+"""
+Pool de connexions MariaDB
+Réutilise les connexions ouvertes au lieu d'en créer une par requête
+"""
+
+import collections
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Levée quand aucune connexion ne se libère avant la fin du délai d'attente"""
+
+
+class ConnectionPool:
+    """Pool borné de connexions, partagé entre les threads du processus"""
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0,
+                 max_lifetime=1800.0, idle_timeout=300.0):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+
+        self._cond = threading.Condition()
+        # Connexions libres : (connexion, créée le, rendue le), la plus récente à droite
+        self._idle = collections.deque()
+        self._created_at = {}
+        self._size = 0
+        self._in_use = 0
+
+        self._borrows = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._opened = 0
+        self._closed = 0
+
+    def fill(self):
+        """Ouvre les connexions jusqu'à atteindre la taille minimale"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((conn, self._created_at[id(conn)], time.monotonic()))
+                self._cond.notify()
+
+    def acquire(self):
+        """Emprunte une connexion valide, en attendant au plus `timeout` secondes"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        timed_out = False
+        to_close = []
+
+        with self._cond:
+            while True:
+                to_close.extend(self._evict_idle(time.monotonic()))
+                if self._idle:
+                    conn, created_at, _ = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    conn = None
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                waited = True
+                self._cond.wait(remaining)
+
+            if timed_out:
+                self._timeouts += 1
+            else:
+                self._in_use += 1
+                self._borrows += 1
+            if waited:
+                wait_time = time.monotonic() - start
+                self._waits += 1
+                self._wait_time_total += wait_time
+                self._wait_time_max = max(self._wait_time_max, wait_time)
+
+        self._close_all(to_close)
+        if timed_out:
+            raise PoolTimeout(f"Aucune connexion disponible après {self.timeout}s")
+
+        try:
+            if conn is not None and not self._is_usable(conn, created_at):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._open()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._size -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn):
+        """Rend une connexion au pool, en annulant toute transaction restée ouverte"""
+        try:
+            # Termine la transaction implicite pour ne pas garder une vue figée des données
+            conn.rollback()
+            reusable = True
+        except Exception:
+            reusable = False
+
+        now = time.monotonic()
+        created_at = self._created_at.get(id(conn), now)
+        if reusable and now - created_at >= self.max_lifetime:
+            reusable = False
+
+        with self._cond:
+            self._in_use -= 1
+            if reusable:
+                self._idle.append((conn, created_at, now))
+            else:
+                self._size -= 1
+            self._cond.notify()
+
+        if not reusable:
+            self._discard(conn)
+
+    def close(self):
+        """Ferme toutes les connexions libres"""
+        with self._cond:
+            idle = [conn for conn, _, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        self._close_all(idle)
+
+    def stats(self):
+        """Photographie de l'état du pool, pour le dimensionner"""
+        with self._cond:
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "borrows": self._borrows,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 3),
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 3),
+                "opened": self._opened,
+                "closed": self._closed,
+            }
+
+    def _open(self):
+        conn = self._connect()
+        self._created_at[id(conn)] = time.monotonic()
+        with self._cond:
+            self._opened += 1
+        return conn
+
+    def _is_usable(self, conn, created_at):
+        if time.monotonic() - created_at >= self.max_lifetime:
+            return False
+        try:
+            conn.ping()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self, now):
+        """Retire les connexions libres inactives depuis trop longtemps (appelé sous verrou)"""
+        evicted = []
+        while self._idle and self._size > self.min_size:
+            conn, _, released_at = self._idle[0]
+            if now - released_at < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            evicted.append(conn)
+        return evicted
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._closed += 1
+
+    def _close_all(self, conns):
+        for conn in conns:
+            self._discard(conn)
@@ -1,59 +1,275 @@
 import mariadb
-import datetime
+import os
+import threading
+import time
+from contextlib import contextmanager
 
-def get_db_connection():
-    conn = mariadb.connect(
+import metrics.metrics as metrics
+import request.slow_query as slow_query
+from request.pool import ConnectionPool
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def open_db_connection():
+    return mariadb.connect(
         user="mysqlusr",
         password="mysqlpwd",
         host="database",
         port=3306,
         database="parc"
     )
-    cur = conn.cursor()
-    return cur, conn
+
+def get_pool():
+    """Retourne le pool de connexions du processus, créé au premier usage
+
+    Après un fork (workers Gunicorn) l'enfant crée son propre pool : les
+    sockets héritées du parent ne doivent pas être partagées.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool_pid = os.getpid()
+                _pool = ConnectionPool(
+                    open_db_connection,
+                    min_size=int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+                    max_size=int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+                    timeout=float(os.environ.get("DB_POOL_TIMEOUT", 5)),
+                    max_lifetime=float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800)),
+                    idle_timeout=float(os.environ.get("DB_POOL_IDLE_TIMEOUT", 300))
+                )
+                try:
+                    _pool.fill()
+                except mariadb.Error as e:
+                    print(f"Pool : préremplissage impossible ({e})", flush=True)
+    return _pool
+
+def close_pool():
+    """Ferme les connexions libres du pool de ce processus, s'il existe"""
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
+
+class InstrumentedCursor:
+    """Curseur qui mesure le temps passé en base, le nombre de requêtes et de lignes lues
+
+    Les requêtes plus longues que le seuil du journal des requêtes lentes y sont
+    enregistrées avec leur plan d'exécution.
+    """
+
+    def __init__(self, cur, conn, buffered=True):
+        self._cur = cur
+        self._conn = conn
+        self._buffered = buffered
+
+    def execute(self, requete, data=()):
+        start = time.perf_counter()
+        try:
+            return self._cur.execute(requete, data)
+        finally:
+            duration = time.perf_counter() - start
+            metrics.record_query(_operation(requete), duration)
+            slow_query.observe(requete, data, duration, lambda: self._explain(requete, data))
+
+    def executemany(self, requete, data):
+        start = time.perf_counter()
+        try:
+            return self._cur.executemany(requete, data)
+        finally:
+            duration = time.perf_counter() - start
+            metrics.record_query(_operation(requete), duration)
+            slow_query.observe(requete, (), duration, lambda: None)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cur.fetchall()
+        metrics.record_fetch(time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchmany(self, size=1):
+        start = time.perf_counter()
+        rows = self._cur.fetchmany(size)
+        metrics.record_fetch(time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cur.fetchone()
+        metrics.record_fetch(time.perf_counter() - start, 0 if row is None else 1)
+        return row
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def _explain(self, requete, data):
+        # Sur un curseur non bufferisé le résultat n'est pas encore lu :
+        # la connexion ne peut pas exécuter d'autre requête
+        if not self._buffered:
+            return None
+        cur = self._conn.cursor(buffered=True)
+        try:
+            cur.execute("EXPLAIN " + requete, data)
+            field_names = [i[0] for i in cur.description]
+            return [dict(zip(field_names, row)) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+def _operation(requete):
+    """Premier mot de la requête SQL (select, insert...), pour étiqueter les métriques"""
+    words = requete.split(None, 1)
+    return words[0].lower() if words else ""
+
+@contextmanager
+def get_db_connection(buffered=True):
+    """Emprunte une connexion au pool le temps d'un bloc `with`
+
+    Par défaut le curseur est bufferisé : le résultat est lu entièrement par
+    execute(), la connexion reste donc utilisable (EXPLAIN des requêtes lentes).
+    `buffered=False` laisse les lignes sur le serveur jusqu'au fetch, pour les
+    gros résultats lus en flux.
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    cur = None
+    try:
+        cur = conn.cursor(buffered=buffered)
+        yield InstrumentedCursor(cur, conn, buffered), conn
+    finally:
+        if cur is not None:
+            try:
+                cur.close()
+            except mariadb.Error:
+                pass
+        pool.release(conn)
+
+@contextmanager
+def transaction():
+    """Exécute plusieurs requêtes sur une même connexion, validées ensemble à la fin du bloc
+
+    En cas d'exception la transaction est annulée au retour de la connexion au pool.
+    """
+    with get_db_connection() as (cur, conn):
+        yield cur
+        conn.commit()
 
 def insert_in_db(requete, data=()):
-    cur, conn = get_db_connection()
-    
-    cur.execute(requete, data)
+    with get_db_connection() as (cur, conn):
+        cur.execute(requete, data)
 
-    conn.commit()
-    add_id = cur.lastrowid
-    conn.close()
+        conn.commit()
+        add_id = cur.lastrowid
     return add_id
 
 def select_from_db(requete, data=()):
-    cur, conn = get_db_connection()
-    
-    cur.execute(requete, data)
-    records = cur.fetchall()
+    with get_db_connection() as (cur, conn):
+        cur.execute(requete, data)
+        records = cur.fetchall()
+
+        field_names = [i[0] for i in cur.description]
+        datetime_columns = _datetime_columns(cur.description)
+
+    return _rows_to_dicts(field_names, records, datetime_columns)
+
+def select_rows(requete, data=()):
+    """Variante compacte de select_from_db : un en-tête de colonnes et des tuples
+
+    À préférer pour les gros résultats, qui n'ont pas besoin d'un dict par ligne.
+    """
+    with get_db_connection() as (cur, conn):
+        cur.execute(requete, data)
+        records = cur.fetchall()
+
+        field_names = [i[0] for i in cur.description]
+        datetime_columns = _datetime_columns(cur.description)
+
+    return Rows(field_names, _format_datetimes(records, datetime_columns))
+
+class Rows:
+    """Résultat de select_rows : `columns` est partagé par toutes les lignes de `rows`"""
+    __slots__ = ("columns", "rows", "_positions")
+
+    def __init__(self, columns, rows):
+        self.columns = tuple(columns)
+        self.rows = rows
+        self._positions = {name: position for position, name in enumerate(self.columns)}
+
+    def index(self, column):
+        """Position de la colonne `column` dans les tuples"""
+        return self._positions[column]
+
+    def as_dicts(self):
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+# Codes de type MariaDB des colonnes lues comme datetime.datetime
+# (TIMESTAMP, DATETIME et leurs variantes à fractions de seconde)
+_DATETIME_TYPES = {7, 12, 17, 18}
+
+def _datetime_columns(description):
+    """Positions des colonnes date-heure, repérées une seule fois par résultat via la description"""
+    return [position for position, column in enumerate(description) if column[1] in _DATETIME_TYPES]
+
+def _format_datetime(value):
+    # Même rendu que strftime('%m/%d/%Y'), nettement plus rapide
+    return '%02d/%02d/%04d' % (value.month, value.day, value.year)
+
+def _rows_to_dicts(field_names, records, positions):
+    """Un dict par ligne, colonnes date-heure `positions` formatées"""
+    result = [dict(zip(field_names, record)) for record in records]
+    for position in positions:
+        name = field_names[position]
+        for element in result:
+            value = element[name]
+            if value is not None:
+                element[name] = _format_datetime(value)
+    return result
+
+def _format_datetimes(records, positions):
+    """Formate les colonnes date-heure `positions` de lignes en tuples"""
+    if not positions:
+        return records
 
-    field_names = [i[0] for i in cur.description]
     result = []
     for record in records:
-        element = {}
-        for key, value in enumerate(record):
-            if type(value) is datetime.datetime:
-                element[field_names[key]] = value.strftime('%m/%d/%Y')
-            else:
-                element[field_names[key]] = value
-        result.append(element)
-
-    conn.close()
+        row = list(record)
+        for position in positions:
+            value = row[position]
+            if value is not None:
+                row[position] = _format_datetime(value)
+        result.append(tuple(row))
     return result
 
+def stream_from_db(requete, data=(), chunk_size=1000):
+    """Génère le résultat d'une requête par paquets de `chunk_size` lignes brutes
+
+    Le premier élément produit est la liste des noms de colonnes. La lecture se fait
+    sur un curseur non bufferisé : la mémoire utilisée ne dépend pas de la taille
+    du résultat. La connexion reste empruntée jusqu'à la fin du générateur.
+    """
+    with get_db_connection(buffered=False) as (cur, conn):
+        cur.execute(requete, data)
+        yield [i[0] for i in cur.description]
+
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
 def delete_from_db(requete, data=()):
-    cur, conn = get_db_connection()
-    
-    cur.execute(requete, data)
+    with get_db_connection() as (cur, conn):
+        cur.execute(requete, data)
 
-    conn.commit()
-    conn.close()
+        conn.commit()
 
 def update_from_db(requete, data=()):
-    cur, conn = get_db_connection()
-    
-    cur.execute(requete, data)
+    with get_db_connection() as (cur, conn):
+        cur.execute(requete, data)
 
-    conn.commit()
-    conn.close()
\ No newline at end of file
+        conn.commit()
@@ -0,0 +1,117 @@
+"""
+Journal des requêtes lentes
+Toute requête plus longue que le seuil est journalisée (SQL normalisé, paramètres
+masqués, plan EXPLAIN) et les plus lentes sont gardées en mémoire par forme de requête
+"""
+
+import os
+import re
+import threading
+import time
+
+THRESHOLD = float(os.environ.get("DB_SLOW_QUERY_MS", 100)) / 1000
+TOP_N = int(os.environ.get("DB_SLOW_QUERY_TOP", 20))
+# Un même plan n'est recapturé qu'après ce délai, pour ne pas charger la base
+EXPLAIN_INTERVAL = float(os.environ.get("DB_SLOW_QUERY_EXPLAIN_INTERVAL", 60))
+
+_EXPLAINABLE = ("select", "update", "delete")
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_statements = {}
+_slow_count = 0
+
+
+def normalize(requete):
+    """Forme canonique d'une requête : littéraux remplacés par ?, listes IN réduites, espaces compactés"""
+    normalized = _STRING.sub("?", requete)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _IN_LIST.sub("(...)", normalized)
+    return _SPACES.sub(" ", normalized).strip()
+
+
+def redact(data):
+    """Paramètres remplacés par leur type (et leur longueur pour les chaînes)"""
+    redacted = []
+    for value in data or ():
+        if value is None:
+            redacted.append("NULL")
+        elif isinstance(value, (str, bytes)):
+            redacted.append(f"<{type(value).__name__}:{len(value)}>")
+        else:
+            redacted.append(f"<{type(value).__name__}>")
+    return redacted
+
+
+def observe(requete, data, duration, explain):
+    """Enregistre une exécution ; `explain()` renvoie le plan, appelé seulement si la requête est lente"""
+    global _slow_count
+    if duration < THRESHOLD:
+        return
+
+    normalized = normalize(requete)
+    now = time.monotonic()
+    with _lock:
+        _slow_count += 1
+        stats = _statements.get(normalized)
+        if stats is None:
+            stats = _statements[normalized] = {
+                "count": 0, "total_ms": 0.0, "max_ms": 0.0, "explain": None, "explained_at": None
+            }
+            _prune()
+        stats["count"] += 1
+        stats["total_ms"] += duration * 1000
+        stats["max_ms"] = max(stats["max_ms"], duration * 1000)
+        capture = (normalized.split(" ", 1)[0].lower() in _EXPLAINABLE
+                   and (stats["explained_at"] is None or now - stats["explained_at"] >= EXPLAIN_INTERVAL))
+        if capture:
+            stats["explained_at"] = now
+
+    plan = None
+    if capture:
+        try:
+            plan = explain()
+        except Exception as e:
+            plan = [f"EXPLAIN impossible : {e}"]
+        with _lock:
+            stats["explain"] = plan
+
+    message = f"Requête lente ({duration * 1000:.1f} ms) : {normalized} | paramètres : {redact(data)}"
+    if plan:
+        message += "\n    " + "\n    ".join(str(line) for line in plan)
+    print(message, flush=True)
+
+
+def top():
+    """Les formes de requête les plus lentes, de la plus lente à la moins lente"""
+    with _lock:
+        items = [
+            {
+                "statement": normalized,
+                "count": stats["count"],
+                "max_ms": round(stats["max_ms"], 3),
+                "avg_ms": round(stats["total_ms"] / stats["count"], 3),
+                "explain": stats["explain"],
+            }
+            for normalized, stats in _statements.items()
+        ]
+    items.sort(key=lambda item: item["max_ms"], reverse=True)
+    return items[:TOP_N]
+
+
+def stats():
+    with _lock:
+        return {"slow_queries": _slow_count, "statements": len(_statements), "threshold_ms": THRESHOLD * 1000}
+
+
+def _prune():
+    """Borne la mémoire : au-delà de 10 x TOP_N formes, on oublie les moins lentes (appelé sous verrou)"""
+    if len(_statements) <= TOP_N * 10:
+        return
+    keep = sorted(_statements.items(), key=lambda item: item[1]["max_ms"], reverse=True)[:TOP_N * 5]
+    _statements.clear()
+    _statements.update(keep)
@@ -1,3 +1,7 @@
+DROP TABLE IF EXISTS cache_invalidation;
+DROP TABLE IF EXISTS tombstone;
+DROP TABLE IF EXISTS revoked_token;
+DROP TABLE IF EXISTS attraction_stats;
 DROP TABLE IF EXISTS critique;
 DROP TABLE IF EXISTS attraction;
 DROP TABLE IF EXISTS users;
@@ -14,7 +18,11 @@ CREATE TABLE attraction (
     nom VARCHAR(255) NOT NULL,
     description TEXT,
     difficulte INT NOT NULL,
-    visible TINYINT(1) DEFAULT 1
+    visible TINYINT(1) DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FULLTEXT INDEX ft_attraction_nom (nom),
+    FULLTEXT INDEX ft_attraction_texte (nom, description)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 CREATE TABLE critique (
@@ -26,9 +34,48 @@ CREATE TABLE critique (
     commentaire TEXT,
     est_anonyme TINYINT(1) DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (attraction_id) REFERENCES attraction(attraction_id) ON DELETE CASCADE,
+    INDEX idx_attraction_id (attraction_id),
+    INDEX idx_created_at (created_at),
+    FULLTEXT INDEX ft_critique_commentaire (commentaire)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE attraction_stats (
+    attraction_id INT PRIMARY KEY,
+    nb_critiques INT NOT NULL DEFAULT 0,
+    somme_notes INT NOT NULL DEFAULT 0,
+    nb_note_1 INT NOT NULL DEFAULT 0,
+    nb_note_2 INT NOT NULL DEFAULT 0,
+    nb_note_3 INT NOT NULL DEFAULT 0,
+    nb_note_4 INT NOT NULL DEFAULT 0,
+    nb_note_5 INT NOT NULL DEFAULT 0,
+    derniere_critique TIMESTAMP NULL,
     FOREIGN KEY (attraction_id) REFERENCES attraction(attraction_id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+CREATE TABLE revoked_token (
+    revoked_id INT AUTO_INCREMENT PRIMARY KEY,
+    digest CHAR(64) NOT NULL UNIQUE,
+    expires_at TIMESTAMP NOT NULL,
+    INDEX idx_expires_at (expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE tombstone (
+    tombstone_id INT AUTO_INCREMENT PRIMARY KEY,
+    entity VARCHAR(20) NOT NULL,
+    entity_id INT NOT NULL,
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_deleted_at (deleted_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE cache_invalidation (
+    invalidation_id INT AUTO_INCREMENT PRIMARY KEY,
+    namespace VARCHAR(30) NOT NULL,
+    item_id INT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- Insertion des données de test
 INSERT INTO attraction (nom, description, difficulte, visible) VALUES 
 ('Silver Star', 'Montagne russe', 5, 1),
@@ -144,14 +144,10 @@ def wait_for_api():
     
     max_attempts = 40
     for i in range(max_attempts):
-        try:
-            import urllib.request
-            response = urllib.request.urlopen('http://localhost:5000/', timeout=2)
-            if response.status == 200:
-                print_color(f"✅ API prête ! (après {i+1} tentatives)", Colors.GREEN)
-                return True
-        except:
-            pass
+        # Le port 5000 n'est pas publié sur l'hôte : test depuis le conteneur
+        if run_command("docker compose exec -T api curl -sf http://localhost:5000/", show_output=False, timeout=5):
+            print_color(f"✅ API prête ! (après {i+1} tentatives)", Colors.GREEN)
+            return True
         
         if (i + 1) % 5 == 0:
             print_color(f"   Tentative {i+1}/{max_attempts}...", Colors.YELLOW)
@@ -222,7 +218,7 @@ def show_urls():
     
     print_color("  📱 Application:  https://parcattraction/accueil", Colors.GREEN + Colors.BOLD)
     print_color("  🔌 API:          https://api/", Colors.GREEN)
-    print_color("  🔌 API directe:  http://localhost:5000/", Colors.GREEN)
+    print_color("  🔌 API directe:  api:5000 (réseau Docker uniquement)", Colors.GREEN)
     print_color("  💻 Frontend:     http://localhost:4200/", Colors.GREEN)
     print_color("  💾 Database:     localhost:3306", Colors.GREEN)
     print_color("\n  🔑 Credentials Database:", Colors.CYAN)